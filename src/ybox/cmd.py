@@ -151,6 +151,25 @@ def check_ybox_exists(docker_cmd: str, box_name: str, exit_on_error: bool = Fals
                                exit_on_error=exit_on_error))
 
 
+def get_active_yboxes(docker_cmd: str) -> set[str]:
+    """
+    Get the names of all the ybox containers that are up and running using a single
+    podman/docker invocation, so this should be preferred over calling :func:`check_active_ybox`
+    for each of a set of containers.
+
+    :param docker_cmd: the podman/docker executable to use
+    :return: set of names of the active ybox containers which is empty if none were found
+             or the podman/docker command failed
+    """
+    ls_result = subprocess.run(
+        [docker_cmd, "container", "ls", "--format={{ .Names }}",
+         f"--filter=label={YboxLabel.CONTAINER_PRIMARY.value}"],
+        check=False, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    if ls_result.returncode != 0:
+        return set()
+    return set(ls_result.stdout.decode("utf-8").split())
+
+
 def build_shell_command(docker_cmd: str, box_name: str, cmd: str,
                         enable_pty: bool = True) -> list[str]:
     """
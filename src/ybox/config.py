@@ -16,6 +16,11 @@ class StaticConfiguration:
     INI configuration files.
     """
 
+    __slots__ = ("_env", "_distribution", "_box_name", "_box_image", "_shared_box_image",
+                 "_localtime", "_timezone", "_pager", "_configs_dir", "_target_configs_dir",
+                 "_scripts_dir", "_target_scripts_dir", "_status_file", "_config_list",
+                 "_app_list")
+
     def __init__(self, env: Environ, distribution: str, box_name: str):
         self._env = env
         # set up the additional environment variables
@@ -26,10 +31,12 @@ class StaticConfiguration:
         self._box_image = f"{Consts.image_prefix()}/{distribution}/{box_name}"
         self._shared_box_image = f"{Consts.shared_image_prefix()}/{distribution}"
         # timezone properties
-        self._localtime = None
+        # readlink fails with EINVAL if not a link, so avoid a separate islink check
+        try:
+            self._localtime: Optional[str] = os.readlink("/etc/localtime")
+        except OSError:
+            self._localtime = None
         self._timezone = None
-        if os.path.islink("/etc/localtime"):
-            self._localtime = os.readlink("/etc/localtime")
         if os.path.exists("/etc/timezone"):
             with open("/etc/timezone", "r", encoding="utf-8") as timezone:
                 self._timezone = timezone.read().rstrip("\n")
@@ -142,6 +149,8 @@ class Consts:
     Defines fixed file/path and other names used by ybox that are not configurable.
     """
 
+    __slots__ = ()
+
     _MAN_DIRS_PATTERN = re.compile(r"/usr(/local)?(/share)?/man(/[^/]*)?/man[0-9][a-zA-Z_]*")
 
     @staticmethod
@@ -3,41 +3,82 @@ Useful user environment settings.
 """
 
 import getpass
+import json
 import os
 import pwd
+import shutil
 import site
 import subprocess
 from datetime import datetime
+from functools import lru_cache
 from importlib.abc import Traversable
 from importlib.resources import files
 from pathlib import Path
-from typing import Optional, Union
+from typing import Optional, Sequence, Union
 
 from .print import print_error, print_notice
 
 PathName = Union[Path, Traversable]
 
+# standard system directories searched for podman/docker executables
+_DOCKER_SEARCH_PATH = "/usr/bin:/usr/local/bin"
+# search path used for absolute configuration paths which is shared by all `Environ` objects
+_ROOT_DIR: tuple[Path, ...] = (Path("/"),)
+# home directory of the current user which does not change for the lifetime of the process
+_DEFAULT_HOME = os.path.expanduser("~")
+# system configuration directory bundled with the package (and its string form)
+_SYS_CONF_DIR = files("ybox").joinpath("conf")
+_SYS_CONF_DIR_STR = str(_SYS_CONF_DIR)
+_SYS_CONF_DIRS: tuple[PathName, ...] = (_SYS_CONF_DIR,)
+
 
 def get_docker_command() -> str:
     """
     If a custom podman/docker executable is defined by YBOX_CONTAINER_MANAGER environment variable,
-    then return it else check for podman and docker (in that order) in the standard /usr/bin path.
+    then return it else check for podman and docker (in that order) in the standard /usr/bin and
+    /usr/local/bin paths.
 
     :return: the podman/docker executable specified in arguments or defined by
              YBOX_CONTAINER_MANAGER environment variable
     """
     # check for podman first then docker
-    if cmd := os.environ.get("YBOX_CONTAINER_MANAGER"):
+    if cmd := os.getenv("YBOX_CONTAINER_MANAGER"):
         if os.access(cmd, os.X_OK):
             return cmd
         raise PermissionError(
             f"Cannot execute '{cmd}' provided in YBOX_CONTAINER_MANAGER environment variable")
-    if os.access("/usr/bin/podman", os.X_OK):
-        return "/usr/bin/podman"
-    if os.access("/usr/bin/docker", os.X_OK):
-        return "/usr/bin/docker"
-    raise FileNotFoundError(
-        "No podman/docker found in /usr/bin and $YBOX_CONTAINER_MANAGER not defined")
+    for name in ("podman", "docker"):
+        if path := shutil.which(name, path=_DOCKER_SEARCH_PATH):
+            return path
+    raise FileNotFoundError("No podman/docker found in /usr/bin or /usr/local/bin and "
+                            "$YBOX_CONTAINER_MANAGER not defined")
+
+
+def _docker_context(docker_cmd: str) -> str:
+    """
+    Determine the current docker context avoiding the `docker context show` subprocess when
+    possible by checking `$DOCKER_HOST`, `$DOCKER_CONTEXT` and `currentContext` in docker's
+    `config.json` (in that order), falling back to `docker context show` if none of them
+    conclusively determines the context.
+
+    :param docker_cmd: the docker executable to use
+    :return: name of the current docker context
+    """
+    if docker_host := os.getenv("DOCKER_HOST"):
+        # an explicit endpoint pointing to the user's socket is a rootless docker daemon
+        if docker_host == f"unix:///run/user/{os.getuid()}/docker.sock":
+            return "rootless"
+    elif docker_ctx := os.getenv("DOCKER_CONTEXT"):
+        return docker_ctx
+    else:
+        config_dir = os.getenv("DOCKER_CONFIG") or f"{_DEFAULT_HOME}/.docker"
+        try:
+            with open(f"{config_dir}/config.json", "r", encoding="utf-8") as config_fd:
+                if docker_ctx := json.load(config_fd).get("currentContext"):
+                    return str(docker_ctx)
+        except (OSError, ValueError, AttributeError):
+            pass
+    return subprocess.check_output([docker_cmd, "context", "show"]).decode("utf-8").strip()
 
 
 class NotSupportedError(Exception):
@@ -51,25 +92,31 @@ class Environ:
     Also captures the current time and sets up the $NOW environment variable.
     """
 
+    __slots__ = ("_home_dir", "_docker_cmd", "_uses_podman", "_target_user", "_target_home",
+                 "_user_base", "_xdg_rt_dir", "_target_xdg_rt_dir", "_now", "_sys_conf_dirs",
+                 "_root_dir", "_configuration_dirs")
+
     def __init__(self, docker_cmd: Optional[str] = None, home_dir: Optional[str] = None):
         """
         Initialize the `Environ` object providing the podman/docker command to use.
 
+        Only the values that are required to set up the environment variables for the
+        configuration files are determined here while the others (like `user_base` and
+        `target_xdg_rt_dir`) are determined on first access.
+
         :param docker_cmd: the podman/docker executable to use,
                            defaults to :func:`get_docker_command()`
         :param home_dir: if a non-default user home directory has to be set
         """
-        self._home_dir = home_dir or os.path.expanduser("~")
+        self._home_dir = home_dir or _DEFAULT_HOME
         self._docker_cmd = docker_cmd or get_docker_command()
         cmd_version = subprocess.check_output([self._docker_cmd, "--version"])
-        self._uses_podman = "podman" in cmd_version.decode("utf-8").lower()
+        self._uses_podman = b"podman" in cmd_version.lower()
         # local user home might be in a different location than /home but target user in the
         # container will always be in /home with podman else /root for the root user with docker
         # as ensured by entrypoint-base.sh script
-        target_uid = 0
         if self._uses_podman:
             self._target_user = getpass.getuser()
-            target_uid = pwd.getpwnam(self._target_user).pw_uid
             self._target_home = f"/home/{self._target_user}"
         else:
             self._target_user = "root"
@@ -77,35 +124,21 @@ class Environ:
             # confirm that docker is being used in rootless mode (not required for podman because
             #   it runs as rootless when run by a non-root user in any case without explicit sudo
             #   which the ybox tools don't use)
-            if (docker_ctx := subprocess.check_output(
-                    [self._docker_cmd, "context", "show"]).decode("utf-8")).strip() != "rootless":
+            if (docker_ctx := _docker_context(self._docker_cmd)) != "rootless":
                 raise NotSupportedError("docker should use the rootless mode (see "
                                         "https://docs.docker.com/engine/security/rootless/) "
                                         f"but the current context is '{docker_ctx}'")
         os.environ["TARGET_HOME"] = self._target_home
-        self._user_base = user_base = site.getuserbase()
-        target_user_base = f"{self._target_home}/.local"
-        self._data_dir = f"{user_base}/share/ybox"
-        self._target_data_dir = f"{target_user_base}/share/ybox"
-        self._xdg_rt_dir = os.environ.get("XDG_RUNTIME_DIR", "")
-        # the container user's one can be different because it is the root user for docker
-        self._target_xdg_rt_dir = f"/run/user/{target_uid}"
+        # these are resolved lazily in the corresponding properties
+        self._user_base: Optional[str] = None
+        self._target_xdg_rt_dir: Optional[str] = None
+        self._configuration_dirs: Optional[tuple[PathName, ...]] = None
+        self._xdg_rt_dir = os.getenv("XDG_RUNTIME_DIR", "")
         self._now = datetime.now()
         os.environ["NOW"] = str(self._now)
-        sys_conf_dir = files("ybox").joinpath("conf")
-        os.environ["YBOX_SYS_CONF_DIR"] = str(sys_conf_dir)
-        self._sys_conf_dirs = [sys_conf_dir]
-        self._root_dir = [Path("/")]
-        self._configuration_dirs: list[PathName] = []
-        # for tests, only the bundled configurations should be tested
-        if os.environ.get("YBOX_TESTING"):
-            print_notice("Running with YBOX_TESTING enabled")
-            self._configuration_dirs = self._sys_conf_dirs
-        else:
-            self._configuration_dirs = [Path(f"{self._home_dir}/.config/ybox"),
-                                        sys_conf_dir]
-        self._user_applications_dir = f"{user_base}/share/applications"
-        self._user_executables_dir = f"{user_base}/bin"
+        os.environ["YBOX_SYS_CONF_DIR"] = _SYS_CONF_DIR_STR
+        self._sys_conf_dirs = _SYS_CONF_DIRS
+        self._root_dir = _ROOT_DIR
 
     def search_config_path(self, conf_path: str, only_sys_conf: bool = False,
                            quiet: bool = False) -> PathName:
@@ -120,19 +153,37 @@ class Environ:
         :return: the path of the configuration file as `Path` or resource file from
                  importlib (i.e. `Traversable`)
         """
+        conf_dirs: Sequence[PathName]
         if os.path.isabs(conf_path):
+            # fast path for absolute paths which need no search
+            if os.access(conf_path, os.R_OK):
+                return Path(conf_path)
             conf_dirs = self._root_dir
         else:
-            conf_dirs = self._sys_conf_dirs if only_sys_conf else self._configuration_dirs
-        for config_dir in conf_dirs:
-            path = config_dir.joinpath(conf_path)
-            if os.access(path, os.R_OK):  # type: ignore
-                return path
+            conf_dirs = self._sys_conf_dirs if only_sys_conf else self.configuration_dirs
+            for config_dir in conf_dirs:
+                path = config_dir.joinpath(conf_path)
+                if os.access(path, os.R_OK):  # type: ignore
+                    return path
         search_dirs = ', '.join([str(file) for file in conf_dirs])
         if not quiet:
             print_error(f"Configuration file '{conf_path}' not found in [{search_dirs}]")
         raise FileNotFoundError(f"Missing configuration file '{conf_path}'")
 
+    @property
+    def configuration_dirs(self) -> tuple[PathName, ...]:
+        """user and system configuration directories (in that order) that are searched
+           for configuration files (only the latter if $YBOX_TESTING is set)"""
+        if self._configuration_dirs is None:
+            # for tests, only the bundled configurations should be tested
+            if os.getenv("YBOX_TESTING"):
+                print_notice("Running with YBOX_TESTING enabled")
+                self._configuration_dirs = self._sys_conf_dirs
+            else:
+                self._configuration_dirs = (Path(f"{self._home_dir}/.config/ybox"),
+                                            *self._sys_conf_dirs)
+        return self._configuration_dirs
+
     @property
     def home(self) -> str:
         """home directory of the current user"""
@@ -166,13 +217,13 @@ class Environ:
     def data_dir(self) -> str:
         """base user directory where runtime data related to all the containers is
            stored in subdirectories"""
-        return self._data_dir
+        return f"{self.user_base}/share/ybox"
 
     @property
     def target_data_dir(self) -> str:
         """base user directory of the container user where runtime data related to all
            the containers is stored"""
-        return self._target_data_dir
+        return f"{self._target_home}/.local/share/ybox"
 
     @property
     def xdg_rt_dir(self) -> str:
@@ -182,6 +233,10 @@ class Environ:
     @property
     def target_xdg_rt_dir(self) -> str:
         """value of $XDG_RUNTIME_DIR for the user in the container"""
+        if self._target_xdg_rt_dir is None:
+            # the container user's one can be different because it is the root user for docker
+            target_uid = pwd.getpwnam(self._target_user).pw_uid if self._uses_podman else 0
+            self._target_xdg_rt_dir = f"/run/user/{target_uid}"
         return self._target_xdg_rt_dir
 
     @property
@@ -192,14 +247,43 @@ class Environ:
     @property
     def user_base(self) -> str:
         """User's local base data directory which is typically ~/.local"""
+        if self._user_base is None:
+            self._user_base = site.getuserbase()
         return self._user_base
 
     @property
     def user_applications_dir(self) -> str:
         """User's local applications directory that holds the .desktop files"""
-        return self._user_applications_dir
+        return f"{self.user_base}/share/applications"
 
     @property
     def user_executables_dir(self) -> str:
         """User's local executables directory which should be in the $PATH"""
-        return self._user_executables_dir
+        return f"{self.user_base}/bin"
+
+
+def get_environ(docker_cmd: Optional[str] = None) -> Environ:
+    """
+    Get a shared `Environ` object for the given `docker_cmd` creating it on first call.
+    Use `clear_environ()` to force creation of a new object in the next call.
+
+    Note that the shared object captures the current time (`Environ.now` and `$NOW`) once when it
+    is created, so create a new `Environ` instead when the actual current time is required.
+
+    :param docker_cmd: the podman/docker executable to use,
+                       defaults to :func:`get_docker_command()`
+    :return: the shared instance of :class:`Environ`
+    """
+    # resolve the default so that callers passing it explicitly share the same object
+    return _get_environ(docker_cmd or get_docker_command())
+
+
+def clear_environ() -> None:
+    """Clear the shared `Environ` object returned by :func:`get_environ`."""
+    _get_environ.cache_clear()
+
+
+@lru_cache(maxsize=1)
+def _get_environ(docker_cmd: str) -> Environ:
+    """cached implementation of :func:`get_environ` for the resolved `docker_cmd`"""
+    return Environ(docker_cmd)
@@ -4,19 +4,30 @@ Helper class for file locking with timeout support.
 
 import errno
 import fcntl
+import os
+import signal
+import threading
 import time
-from datetime import datetime
-from io import IOBase
+from types import FrameType
 from typing import Optional
 
 
+class _LockWaitTimeout(TimeoutError):
+    """Raised by the SIGALRM handler to interrupt a blocking wait for the lock."""
+
+
 class FileLock:
     """
-    A simple file locker class that takes an `fcntl()` lock on given file with polling and timeout.
+    A simple file locker class that takes an `fcntl()` lock on given file with timeout.
     The lock file should always be separate from the resource being locked (if the resource
     is also a file).
 
-    The file is created on first access or truncated if it exists, and never removed thereafter
+    When used in the main thread, this waits for the lock using a blocking `fcntl()` call that
+    is interrupted by a `SIGALRM` timer on timeout, so the lock is acquired as soon as it is
+    released by its current holder. In other threads (where signal handlers cannot be installed),
+    this falls back to polling for the lock at the given interval.
+
+    The file is created on first access if it does not exist, and never removed thereafter
     to avoid any complications. Lock files on NFS files may or may not work as expected
     depending on the NFS server characteristics, so this class can safely be used only
     with the lock file on the local filesystem.
@@ -29,49 +40,123 @@ class FileLock:
     def __init__(self, lock_file: str, timeout_secs: float = 300.0, poll_interval: float = 1.0):
         """
         Initialize the lock giving a file which should be a separate lock file from the
-        actual resource to be locked. This file is created or truncated on acquisition.
+        actual resource to be locked. This file is created on acquisition if not present.
 
         :param lock_file: the lock file which can be any unique file corresponding to
                           the resource being locked
         :param timeout_secs: lock timeout in seconds (use negative for infinite wait)
         :param poll_interval: polling interval at which to check for lock to be available
+                              when waiting for the lock in a thread other than the main thread
         """
         self._lock_file = lock_file
-        self._lock_fd: Optional[IOBase] = None
+        self._lock_fd: Optional[int] = None
         self._timeout = timeout_secs
         self._poll = poll_interval
 
     def __enter__(self):
         success = False
-        self._lock_fd = open(self._lock_file, "w+", encoding="utf-8")
+        # the file is only used for locking, so avoid a python file object and truncation
+        self._lock_fd = lock_fd = os.open(self._lock_file,
+                                          os.O_CREAT | os.O_RDWR | os.O_CLOEXEC, 0o644)
         try:
-            start_time: Optional[datetime] = None
-            remaining_time = self._timeout
-            while remaining_time != 0:
-                try:
-                    fcntl.lockf(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
-                    success = True
+            if self._try_lock(lock_fd):
+                success = True
+                return
+            start_time = time.monotonic()
+            if self._timeout != 0:
+                if threading.current_thread() is threading.main_thread():
+                    success = self._wait_for_lock(lock_fd)
+                else:
+                    success = self._poll_for_lock(lock_fd)
+                if success:
                     return
-                except OSError as ex:
-                    if ex.errno in (errno.EACCES, errno.EAGAIN):
-                        # start proper timing only after first failure
-                        if not start_time:
-                            start_time = datetime.now()
-                        # wait for poll time, then try again
-                        time.sleep(self._poll)
-                        # treat -ve timeout as infinite where remaining_time will never reach 0
-                        if remaining_time > 0:
-                            remaining_time -= self._poll
-                            remaining_time = max(remaining_time, 0)
-                    else:
-                        raise
-            wait_time = (datetime.now() - start_time).total_seconds() if start_time else 0.0
+            wait_time = time.monotonic() - start_time
             raise TimeoutError(f"Failed to lock '{self._lock_file}' in {wait_time} seconds")
         finally:
             if not success:
-                self._lock_fd.close()
+                self._lock_fd = None
+                os.close(lock_fd)
+
+    @staticmethod
+    def _try_lock(lock_fd: int) -> bool:
+        """
+        Try to acquire the lock without blocking and return True on success or False if
+        the lock is held by someone else. Any other errors are raised as `OSError`.
+        """
+        try:
+            fcntl.lockf(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError as ex:
+            if ex.errno in (errno.EACCES, errno.EAGAIN):
+                return False
+            raise
+
+    def _wait_for_lock(self, lock_fd: int) -> bool:
+        """
+        Wait for the lock using a blocking `fcntl()` call interrupted by a `SIGALRM` timer
+        after the timeout. This should only be invoked from the main thread.
+
+        Any `ITIMER_REAL` timer already armed by the caller is saved and re-armed with its
+        remaining time once the wait is over, so an expiry of that timer during the wait
+        is delivered only after the wait is complete.
+
+        :return: True if the lock was acquired else False if the wait timed out
+        """
+        if self._timeout < 0:
+            fcntl.lockf(lock_fd, fcntl.LOCK_EX)
+            return True
+
+        def on_alarm(_signum: int, _frame: Optional[FrameType]) -> None:
+            raise _LockWaitTimeout()
+
+        start_time = time.monotonic()
+        old_handler = signal.signal(signal.SIGALRM, on_alarm)
+        old_delay, old_interval = 0.0, 0.0
+        try:
+            old_delay, old_interval = signal.setitimer(signal.ITIMER_REAL, self._timeout)
+            try:
+                fcntl.lockf(lock_fd, fcntl.LOCK_EX)
+            finally:
+                # disarm the timer while still inside the outer try so that the alarm cannot
+                # fire during the cleanup below
+                signal.setitimer(signal.ITIMER_REAL, 0)
+            return True
+        except _LockWaitTimeout:
+            # the alarm can fire after lockf() has returned but before the timer is disarmed,
+            # so check for ownership again (a lock held by this process is granted again);
+            # the timer is one-shot so this cannot be interrupted by another alarm
+            return self._try_lock(lock_fd)
+        finally:
+            signal.signal(signal.SIGALRM, old_handler)
+            if old_delay > 0:
+                # re-arm the previous timer with its remaining time, firing it immediately
+                # if it expired during the wait
+                remaining = max(old_delay - (time.monotonic() - start_time), 1e-6)
+                signal.setitimer(signal.ITIMER_REAL, remaining, old_interval)
+
+    def _poll_for_lock(self, lock_fd: int) -> bool:
+        """
+        Poll for the lock at `poll_interval` till the timeout.
+
+        :return: True if the lock was acquired else False if the wait timed out
+        """
+        # treat -ve timeout as infinite where the deadline will never be reached
+        deadline = time.monotonic() + self._timeout if self._timeout > 0 else None
+        while True:
+            # wait for poll time (or till the deadline if earlier), then try again
+            if deadline is None:
+                time.sleep(self._poll)
+            elif (remaining_time := deadline - time.monotonic()) > 0:
+                time.sleep(min(self._poll, remaining_time))
+            else:
+                return False
+            if self._try_lock(lock_fd):
+                return True
 
     def __exit__(self, ex_type, ex_value, ex_traceback):  # type: ignore
-        if self._lock_fd:
-            fcntl.lockf(self._lock_fd, fcntl.LOCK_UN)
-            self._lock_fd.close()
+        if (lock_fd := self._lock_fd) is not None:
+            self._lock_fd = None
+            try:
+                fcntl.lockf(lock_fd, fcntl.LOCK_UN)
+            finally:
+                os.close(lock_fd)
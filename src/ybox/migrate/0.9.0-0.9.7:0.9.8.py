@@ -5,11 +5,11 @@ Invoke this script using `exec` passing the `StaticConfiguration` object as `con
 and parsed distribution configuration `ConfigParser` object as `distro_config` local variable.
 """
 
-import subprocess
+import os
 from configparser import ConfigParser
-from pathlib import Path
 from typing import cast
 
+from ybox.cmd import run_command
 from ybox.config import Consts, StaticConfiguration
 from ybox.util import copy_ybox_scripts_to_container
 
@@ -21,13 +21,29 @@ copy_ybox_scripts_to_container(static_conf, distro_conf)
 # rename PKGMGR_CLEANUP to PKGMGR_CLEAN in pkgmgr.conf
 scripts_dir = static_conf.scripts_dir
 pkgmgr_conf = f"{scripts_dir}/pkgmgr.conf"
-with open(pkgmgr_conf, "r", encoding="utf-8") as pkgmgr_file:
-    pkgmgr_data = pkgmgr_file.read()
-with open(pkgmgr_conf, "w", encoding="utf-8") as pkgmgr_file:
-    pkgmgr_file.write(pkgmgr_data.replace("PKGMGR_CLEANUP", "PKGMGR_CLEAN"))
-# run entrypoint-root.sh again to refresh scripts and configuration
-subprocess.run([static_conf.env.docker_cmd, "exec", "-it", static_conf.box_name, "/usr/bin/sudo",
-                "/bin/bash", f"{static_conf.target_scripts_dir}/entrypoint-root.sh"])
+# rewrite line-by-line into a temporary file which atomically replaces the original at the end;
+# the names are ASCII so work on bytes directly without any decode/encode
+pkgmgr_conf_tmp = f"{pkgmgr_conf}.tmp"
+pkgmgr_changed = False
+with open(pkgmgr_conf, "rb") as pkgmgr_file:
+    with open(pkgmgr_conf_tmp, "wb") as pkgmgr_tmp_file:
+        for line in pkgmgr_file:
+            if b"PKGMGR_CLEANUP" in line:
+                line = line.replace(b"PKGMGR_CLEANUP", b"PKGMGR_CLEAN")
+                pkgmgr_changed = True
+            pkgmgr_tmp_file.write(line)
+# leave the file untouched if it already has the new name (e.g. freshly copied scripts)
+if pkgmgr_changed:
+    os.replace(pkgmgr_conf_tmp, pkgmgr_conf)
+else:
+    os.unlink(pkgmgr_conf_tmp)
+# run entrypoint-root.sh again to refresh scripts and configuration (non-interactive so no TTY),
+# and exit on failure so that the init-done file below is not created
+run_command([static_conf.env.docker_cmd, "exec", static_conf.box_name, "/usr/bin/sudo",
+             "/bin/bash", f"{static_conf.target_scripts_dir}/entrypoint-root.sh"],
+            error_msg="refreshing container scripts and configuration")
 
 # touch the file to indicate that first run initialization of entrypoint.sh is complete
-Path(f"{scripts_dir}/{Consts.entrypoint_init_done_file()}").touch(mode=0o644)
+# (only its existence matters, so just create it with a single open instead of `Path.touch`)
+os.close(os.open(f"{scripts_dir}/{Consts.entrypoint_init_done_file()}",
+                 os.O_CREAT | os.O_WRONLY | os.O_CLOEXEC, 0o644))
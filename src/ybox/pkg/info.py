@@ -3,11 +3,20 @@ Show detailed information of installed or repository packages in an active ybox
 """
 
 import argparse
+import errno
+import shlex
+import signal
+import subprocess
 import sys
 from configparser import SectionProxy
 
-from ybox.cmd import PkgMgr, page_command
+from ybox.cmd import PkgMgr, page_output
 from ybox.config import StaticConfiguration
+from ybox.print import print_error, print_warn
+
+# exit codes of the info command when it is killed by SIGPIPE: the first is for the podman/docker
+# process itself while the second is for the command inside the container (128 + signal number)
+_SIGPIPE_CODES = (-signal.SIGPIPE, 128 + signal.SIGPIPE)
 
 
 # noinspection PyUnusedLocal
@@ -22,14 +31,36 @@ def info_packages(args: argparse.Namespace, pkgmgr: SectionProxy, docker_cmd: st
     :param conf: the :class:`StaticConfiguration` for the container
     :return: integer exit status of info command where 0 represents success
     """
-    quiet_flag = pkgmgr[PkgMgr.QUIET_DETAILS_FLAG.value] if args.quiet else ""
     packages: list[str] = args.packages
+    # command-line always has at least one package but check for direct invocations
+    if not packages:
+        print_warn("No packages specified for info")
+        return 0
+    quiet_flag = pkgmgr[PkgMgr.QUIET_DETAILS_FLAG.value] if args.quiet else ""
     info_cmd = pkgmgr[PkgMgr.INFO_ALL.value] if args.all else pkgmgr[PkgMgr.INFO.value]
-    info_cmd = info_cmd.format(quiet=quiet_flag, packages=" ".join(packages))
+    # quote the package names since the command is run using `bash -c`
+    info_cmd = info_cmd.format(quiet=quiet_flag, packages=shlex.join(packages))
     docker_args = [docker_cmd, "exec"]
-    if sys.stdout.isatty():  # don't act as a terminal if it is being redirected
-        docker_args.append("-it")
+    # don't act as a terminal if it is being redirected; interactive mode is not used since the
+    # command runs concurrently with the pager, so it should not read from the terminal
+    if sys.stdout.isatty():
+        docker_args.append("-t")
     docker_args.extend([conf.box_name, "/bin/bash", "-c", info_cmd])
     # empty pager argument is a valid one and indicates no pagination, hence the `is None` check
     pager: str = args.pager if args.pager is not None else conf.pager
-    return page_command(docker_args, pager, error_msg="SKIP")
+    # stream the output of the command directly to the pager rather than buffering all of it
+    try:
+        with subprocess.Popen(docker_args, stdin=subprocess.DEVNULL,
+                              stdout=subprocess.PIPE) as info_proc:
+            assert info_proc.stdout is not None
+            pager_code = page_output(info_proc.stdout, pager)
+            # close the read end so that the command does not block if pager exited early
+            info_proc.stdout.close()
+            # the command gets SIGPIPE if the pager was exited early (e.g. using 'q' in less)
+            # which is a normal exit, so ignore that
+            if (code := info_proc.wait()) in _SIGPIPE_CODES:
+                return pager_code
+            return code or pager_code
+    except OSError as err:
+        print_error(f"FAILURE invoking '{docker_cmd}': {err}")
+        return err.errno or errno.ENOENT
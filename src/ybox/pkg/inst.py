@@ -3,16 +3,18 @@ Methods for package installation on an active ybox container.
 """
 
 import argparse
+import dataclasses
+import functools
 import io
 import os
 import re
+import shlex
 import shutil
 import subprocess
 import sys
 import tempfile
 from configparser import ConfigParser, SectionProxy
-from pathlib import Path
-from typing import Callable, Optional, Union
+from typing import Callable, Optional, Union, cast
 
 from simple_term_menu import TerminalMenu  # type: ignore
 
@@ -21,13 +23,26 @@ from ybox.config import Consts, StaticConfiguration
 from ybox.print import print_error, print_info, print_notice, print_warn
 from ybox.state import (CopyType, DependencyType, RuntimeConfiguration,
                         YboxStateManagement)
-from ybox.util import check_package, ini_file_reader, select_item_from_menu
+from ybox.util import (check_package, check_packages, ini_file_reader,
+                       select_item_from_menu)
 
 # match both "Exec=" and "TryExec=" lines (don't capture trailing newline)
 _EXEC_RE = re.compile(r"^(\s*(Try)?Exec\s*=\s*)(\S+)\s*(.*?)\s*$")
 # match !p and !a to replace executable program (third group above) and arguments respectively
 _FLAGS_RE = re.compile("![ap]")
 _LOCAL_BIN_DIRS = ["/usr/bin", "/bin", "/usr/sbin", "/sbin", "/usr/local/bin", "/usr/local/sbin"]
+# options to pass through the environment variables required by GUI apps in the wrappers
+_EXEC_ENV_OPTS = "-e=XAUTHORITY -e=DISPLAY -e=FREETYPE_PROPERTIES"
+# sets of directories on the container having desktop files and executables to be wrapped
+_DESKTOP_DIRS = frozenset(Consts.container_desktop_dirs())
+_EXECUTABLE_DIRS = frozenset(Consts.container_bin_dirs())
+# combined regex for the directories on the container having application icons which captures
+# each directory separately (see _select_app_icon)
+_ICON_DIR_RE = re.compile(f"({')|('.join(Consts.container_icon_dirs())})")
+# end of line characters in the output of optional dependencies command
+_EOL_RE = re.compile(b"[\r\n]")
+# maximum number of bytes read at a time from the output of optional dependencies command
+_READ_CHUNK_SIZE = 4096
 
 
 def install_package(args: argparse.Namespace, pkgmgr: SectionProxy, docker_cmd: str,
@@ -68,19 +83,23 @@ def install_package(args: argparse.Namespace, pkgmgr: SectionProxy, docker_cmd:
     opt_dep_flag = pkgmgr[PkgMgr.OPT_DEP_FLAG.value]
     check_avail = pkgmgr[PkgMgr.CHECK_AVAIL.value]
     check_inst = pkgmgr[PkgMgr.CHECK_INSTALL.value]
+    # parse the container configuration only once for the package and its optional dependencies
+    if isinstance(runtime_conf.ini_config, str) and \
+            (parsed_box_conf := _get_parsed_box_conf(runtime_conf.ini_config)) is not None:
+        runtime_conf = dataclasses.replace(runtime_conf, ini_config=parsed_box_conf)
     return _install_package(args.package, args, install_cmd, list_cmd, docker_cmd, conf,
-                            runtime_conf, state, opt_deps_cmd, opt_dep_flag, False,
-                            args.check_package, check_avail, check_inst, selected_deps, args.quiet)
+                            runtime_conf, state, opt_deps_cmd, opt_dep_flag, args.check_package,
+                            check_avail, check_inst, selected_deps, args.quiet)
 
 
 def _install_package(package: str, args: argparse.Namespace, install_cmd: str, list_cmd: str,
                      docker_cmd: str, conf: StaticConfiguration, rt_conf: RuntimeConfiguration,
                      state: YboxStateManagement, opt_deps_cmd: str, opt_dep_flag: str,
-                     opt_dep_install: bool, check_pkg: bool, check_avail: str, check_inst: str,
+                     check_pkg: bool, check_avail: str, check_inst: str,
                      selected_deps: Optional[list[str]], quiet: int) -> int:
     """
-    Real workhorse for :func:`install_package` that is invoked recursively for
-    optional dependencies if required.
+    Real workhorse for :func:`install_package` that also installs the selected optional
+    dependencies using :func:`_install_optional_deps`.
 
     :param package: the package to be installed
     :param args: arguments having all the attributes passed by the user (`package` is ignored)
@@ -95,7 +114,6 @@ def _install_package(package: str, args: argparse.Namespace, install_cmd: str, l
     :param opt_deps_cmd: command to determine optional dependencies as read from `distro.ini`
     :param opt_dep_flag: flag to be added during installation of an optional dependency to mark
                          it as a dependency (as read from `distro.ini`)
-    :param opt_dep_install: `True` if installation is for an optional dependency
     :param check_pkg: if True then skip installation if package already exists
     :param check_avail: command to check if package is available in the package repositories
     :param check_inst: command to check if package is installed
@@ -105,31 +123,13 @@ def _install_package(package: str, args: argparse.Namespace, install_cmd: str, l
     """
     # need to determine optional dependencies before installation else second level or higher
     # dependencies will never be found (as the dependencies are already installed)
-    optional_deps: list[tuple[str, str, int]] = []
-    installed_optional_deps: set[str] = set()
-    if opt_dep_install:
-        resolved_install_cmd = install_cmd.format(opt_dep=opt_dep_flag)
-    else:
-        resolved_install_cmd = install_cmd.format(opt_dep="")
+    resolved_install_cmd = install_cmd.format(opt_dep="")
     # don't exit on error here because the caller may have further actions to perform before exit
-    code = -1
-    if check_pkg:
-        code, inst_pkgs = check_package(docker_cmd, check_inst, package, conf.box_name)
-        if code == 0:
-            if not quiet:
-                suffix = "" if len(inst_pkgs) == 1 and package == inst_pkgs[0] \
-                    else f" (as {inst_pkgs})"
-                print_notice(f"'{package}'{suffix} is already installed in '{conf.box_name}'")
-            package = inst_pkgs[0]
+    code, package = _resolve_package(package, docker_cmd, conf, check_pkg, check_avail,
+                                     check_inst, quiet)
+    if code > 0:
+        return code
     if code != 0:
-        if check_avail:
-            _, avail_pkgs = check_package(docker_cmd, check_avail, package, conf.box_name)
-            if len(avail_pkgs) > 1:
-                print_notice(f"Multiple packages found for '{package}', select one to install")
-                if selected_pkg := select_item_from_menu(avail_pkgs):
-                    package = selected_pkg
-                else:
-                    return 1
         if not quiet:
             print_info(f"Installing '{package}' in '{conf.box_name}'")
         code = int(run_command(build_shell_command(
@@ -145,34 +145,12 @@ def _install_package(package: str, args: argparse.Namespace, install_cmd: str, l
                 print_error(f"Package '{package}' was not installed successfully")
                 return 1
     if code == 0:
-        skip_desktop_files = args.skip_desktop_files
-        skip_executables = args.skip_executables
-        copy_type = CopyType(0)
-        # check if wrappers for optional dependencies have to be created
-        if not opt_dep_install or args.add_dep_wrappers:
-            if not skip_desktop_files:
-                copy_type |= CopyType.DESKTOP
-            if not skip_executables:
-                copy_type |= CopyType.EXECUTABLE
-        # TODO: wrappers for newly installed required dependencies should also be created;
-        #       handle DependencyType.SUGGESTION if supported by underlying package manager
-        app_flags: dict[str, str] = {}
-        if args.app_flags:
-            for flag in args.app_flags.split(","):
-                if (split_idx := flag.find("=")) != -1:
-                    app_flags[flag[:split_idx]] = flag[split_idx + 1:]
-        local_copies = wrap_container_files(package, copy_type, app_flags, list_cmd,
-                                            docker_cmd, conf, rt_conf.ini_config,
-                                            rt_conf.shared_root, quiet)
-        dep_type, dep_of = (DependencyType.OPTIONAL, args.package) if opt_dep_install else (
-            None, "")
-        state.register_package(conf.box_name, package, local_copies, copy_type, app_flags,
-                               rt_conf.shared_root, dep_type, dep_of)
+        _wrap_and_register_package(package, args, list_cmd, docker_cmd, conf, rt_conf, state,
+                                   False, quiet)
         # get optional deps even if args.skip_opt_deps is true to obtain installed_optional_deps
         # which need to be registered against this package too (state.register_dependency below)
-        if not opt_dep_install:
-            optional_deps, installed_optional_deps = get_optional_deps(package, docker_cmd,
-                                                                       conf.box_name, opt_deps_cmd)
+        optional_deps, installed_optional_deps = get_optional_deps(
+            package, docker_cmd, conf.box_name, opt_deps_cmd, quiet)
         # register the recorded optional dependencies for this package too
         if recorded_deps := state.check_packages(conf.box_name, installed_optional_deps):
             for dep in recorded_deps:
@@ -180,16 +158,161 @@ def _install_package(package: str, args: argparse.Namespace, install_cmd: str, l
         if optional_deps and selected_deps is None and not args.skip_opt_deps:
             selected_deps = select_optional_deps(package, optional_deps)
         if selected_deps:
-            for dep in selected_deps:
-                _install_package(dep, args, install_cmd, list_cmd, docker_cmd, conf, rt_conf,
-                                 state, "", opt_dep_flag, True, check_pkg, check_avail,
-                                 check_inst, None, quiet)
+            _install_optional_deps(selected_deps, args, install_cmd.format(opt_dep=opt_dep_flag),
+                                   list_cmd, docker_cmd, conf, rt_conf, state, check_pkg,
+                                   check_avail, check_inst, quiet)
 
     return code
 
 
-def get_optional_deps(package: str, docker_cmd: str, container_name: str,
-                      opt_deps_cmd: str) -> tuple[list[tuple[str, str, int]], set[str]]:
+def _resolve_package(package: str, docker_cmd: str, conf: StaticConfiguration, check_pkg: bool,
+                     check_avail: str, check_inst: str, quiet: int) -> tuple[int, str]:
+    """
+    Check if a package is already installed (if `check_pkg` is True), else resolve the package
+    to be installed when there are multiple choices available for it in the repositories.
+
+    :param package: the package to be installed
+    :param docker_cmd: the podman/docker executable to use
+    :param conf: the :class:`StaticConfiguration` for the container
+    :param check_pkg: if True then check if package is already installed
+    :param check_avail: command to check if package is available in the package repositories
+    :param check_inst: command to check if package is installed
+    :param quiet: perform operations quietly
+    :return: tuple of an integer code and the resolved package name where the code is 0 if the
+             package is already installed (when the name is that of the installed package),
+             negative if the package needs to be installed and positive if user did not select
+             any of the multiple choices available for the package
+    """
+    if check_pkg:
+        code, inst_pkgs = check_package(docker_cmd, check_inst, package, conf.box_name)
+        if code == 0:
+            if not quiet:
+                suffix = "" if len(inst_pkgs) == 1 and package == inst_pkgs[0] \
+                    else f" (as {inst_pkgs})"
+                print_notice(f"'{package}'{suffix} is already installed in '{conf.box_name}'")
+            return 0, inst_pkgs[0]
+    if check_avail:
+        _, avail_pkgs = check_package(docker_cmd, check_avail, package, conf.box_name)
+        if len(avail_pkgs) > 1:
+            print_notice(f"Multiple packages found for '{package}', select one to install")
+            if selected_pkg := select_item_from_menu(avail_pkgs):
+                return -1, selected_pkg
+            return 1, package
+    return -1, package
+
+
+def _install_optional_deps(deps: list[str], args: argparse.Namespace, install_cmd: str,
+                           list_cmd: str, docker_cmd: str, conf: StaticConfiguration,
+                           rt_conf: RuntimeConfiguration, state: YboxStateManagement,
+                           check_pkg: bool, check_avail: str, check_inst: str,
+                           quiet: int) -> None:
+    """
+    Install the given optional dependencies of a package using a single invocation of the
+    package manager, then create their wrapper files and register them in the state database.
+    If the combined installation fails, then the dependencies are installed one by one so that
+    a failure for one of them does not affect the others.
+
+    :param deps: names of the optional dependencies to be installed
+    :param args: arguments having all the attributes passed by the user (`package` is the
+                 package whose optional dependencies are being installed)
+    :param install_cmd: installation command as read from `distro.ini` configuration file of the
+                        distribution with the `opt_dep_flag` already filled in
+    :param list_cmd: command to list files for an installed package read from `distro.ini`
+    :param docker_cmd: the podman/docker executable to use
+    :param conf: the :class:`StaticConfiguration` for the container
+    :param rt_conf: the `RuntimeConfiguration` of the container
+    :param state: instance of `YboxStateManagement` having the state of all ybox containers
+    :param check_pkg: if True then skip installation of dependencies that already exist
+    :param check_avail: command to check if package is available in the package repositories
+    :param check_inst: command to check if package is installed
+    :param quiet: perform operations quietly
+    """
+    installed_deps: list[str] = []
+    pending_deps: list[str] = []
+    for dep in deps:
+        code, dep = _resolve_package(dep, docker_cmd, conf, check_pkg, check_avail, check_inst,
+                                     quiet)
+        if code == 0:
+            installed_deps.append(dep)
+        elif code < 0:
+            pending_deps.append(dep)
+    if pending_deps:
+        dep_names = " ".join(pending_deps)
+        if not quiet:
+            print_info(f"Installing '{dep_names}' in '{conf.box_name}'")
+        quoted_deps = " ".join(shlex.quote(dep) for dep in pending_deps)
+        # exit codes of the dependencies that failed when installed one at a time
+        failed_deps: dict[str, int] = {}
+        if int(run_command(build_shell_command(
+                docker_cmd, conf.box_name, f"{install_cmd} {quoted_deps}"), exit_on_error=False,
+                error_msg=f"installing '{dep_names}'")) != 0 and len(pending_deps) > 1:
+            print_warn("Retrying installation of the optional dependencies one at a time")
+            for dep in pending_deps:
+                if (code := int(run_command(build_shell_command(
+                        docker_cmd, conf.box_name, f"{install_cmd} {shlex.quote(dep)}"),
+                        exit_on_error=False, error_msg=f"installing '{dep}'"))) != 0:
+                    failed_deps[dep] = code
+        # actual installed package name can be different due to package being virtual and/or
+        # having multiple choices, so check for all of them using a single podman/docker exec
+        for dep, inst_pkgs in check_packages(docker_cmd, check_inst, pending_deps,
+                                             conf.box_name).items():
+            if inst_pkgs:
+                installed_deps.append(inst_pkgs[0])  # first is the latest installation
+            elif (code := failed_deps.get(dep)) is not None:
+                print_error(f"Package '{dep}' was not installed successfully (exit code {code})")
+            else:
+                print_error(f"Package '{dep}' was not installed successfully")
+    for dep in installed_deps:
+        _wrap_and_register_package(dep, args, list_cmd, docker_cmd, conf, rt_conf, state, True,
+                                   quiet)
+
+
+def _wrap_and_register_package(package: str, args: argparse.Namespace, list_cmd: str,
+                               docker_cmd: str, conf: StaticConfiguration,
+                               rt_conf: RuntimeConfiguration, state: YboxStateManagement,
+                               opt_dep_install: bool, quiet: int) -> None:
+    """
+    Create wrapper files for an installed package as required by the flags in `args` and
+    register the package in the state database.
+
+    :param package: the installed package
+    :param args: arguments having all the attributes passed by the user (`package` is ignored
+                 unless this is an optional dependency when it is the package it belongs to)
+    :param list_cmd: command to list files for an installed package read from `distro.ini`
+    :param docker_cmd: the podman/docker executable to use
+    :param conf: the :class:`StaticConfiguration` for the container
+    :param rt_conf: the `RuntimeConfiguration` of the container
+    :param state: instance of `YboxStateManagement` having the state of all ybox containers
+    :param opt_dep_install: `True` if installation is for an optional dependency
+    :param quiet: perform operations quietly
+    """
+    skip_desktop_files = args.skip_desktop_files
+    skip_executables = args.skip_executables
+    copy_type = CopyType(0)
+    # check if wrappers for optional dependencies have to be created
+    if not opt_dep_install or args.add_dep_wrappers:
+        if not skip_desktop_files:
+            copy_type |= CopyType.DESKTOP
+        if not skip_executables:
+            copy_type |= CopyType.EXECUTABLE
+    # TODO: wrappers for newly installed required dependencies should also be created;
+    #       handle DependencyType.SUGGESTION if supported by underlying package manager
+    app_flags: dict[str, str] = {}
+    if args.app_flags:
+        for flag in args.app_flags.split(","):
+            if (split_idx := flag.find("=")) != -1:
+                app_flags[flag[:split_idx]] = flag[split_idx + 1:]
+    local_copies = wrap_container_files(package, copy_type, app_flags, list_cmd,
+                                        docker_cmd, conf, rt_conf.ini_config,
+                                        rt_conf.shared_root, quiet)
+    dep_type, dep_of = (DependencyType.OPTIONAL, args.package) if opt_dep_install else (
+        None, "")
+    state.register_package(conf.box_name, package, local_copies, copy_type, app_flags,
+                           rt_conf.shared_root, dep_type, dep_of)
+
+
+def get_optional_deps(package: str, docker_cmd: str, container_name: str, opt_deps_cmd: str,
+                      quiet: int = 0) -> tuple[list[tuple[str, str, int]], set[str]]:
     """
     Find the optional dependencies recursively, removing the ones already installed.
 
@@ -197,6 +320,8 @@ def get_optional_deps(package: str, docker_cmd: str, container_name: str,
     :param docker_cmd: the podman/docker executable to use
     :param container_name: name of the ybox container
     :param opt_deps_cmd: command to determine optional dependencies as read from `distro.ini`
+    :param quiet: perform operations quietly: a non-zero value skips the progressive display
+                  of output (and pty allocation) and instead displays it all at the end
     :return: first part is list of tuples having the name of optional dependency, its description
              and an integer `level` denoting its depth in the dependency tree
              (i.e. level 1 means immediate dependency of the package, 2 means dependency of
@@ -223,36 +348,27 @@ def get_optional_deps(package: str, docker_cmd: str, container_name: str,
     #  2) redirect PKG: lines somewhere else like a common file: this can be done but will
     #          likely be more messy than the code below (e.g. handle concurrent executions),
     #          but still can be considered in future
+    # For the quiet mode, the progressive display is skipped and the output is read in one go.
     with subprocess.Popen(build_shell_command(
-            docker_cmd, container_name, f"{opt_deps_cmd} {package}"),
+            docker_cmd, container_name, f"{opt_deps_cmd} {package}", enable_pty=not quiet),
             stdout=subprocess.PIPE) as deps_result:
-        line = bytearray()
-        # possible end of lines
-        eol1 = b"\r"[0]
-        eol2 = b"\n"[0]
-        buffered = 0
-        assert deps_result.stdout is not None
-        # readline does not work for in-place updates like from aria2
-        while char := deps_result.stdout.read(1):
-            sys.stdout.buffer.write(char)
-            buffered += 1
-            if char[0] == eol1 or char[0] == eol2:
-                sys.stdout.flush()
-                buffered = 0
-                output = line.decode("utf-8")
-                line.clear()
-                if output == pkg_start:
-                    break
-            else:
-                line.append(char[0])
-                if buffered >= 4:  # flush frequently to show download progress, for example
-                    sys.stdout.flush()
-                    buffered = 0
+        # stdout is a BufferedReader by default (bufsize=-1)
+        deps_out = cast(io.BufferedReader, deps_result.stdout)
+        header = pkg_start.encode("utf-8")
+        if quiet:
+            # without a pty the lines end with '\n', so prepend one to match header on first line
+            info, header_line, pkg_data = (b"\n" + deps_out.read()).partition(
+                b"\n" + header + b"\n")
+            sys.stdout.buffer.write((info + header_line)[1:])
+        else:
+            pkg_data = _display_till_header(deps_out, header)
         sys.stdout.flush()
-        while pkg_out := deps_result.stdout.readline():
-            output = pkg_out.decode("utf-8")
-            # there can be a trailing '\n' from the loop before due to '\r\n' ending
-            if output == "\n":
+        pkg_data += deps_out.read()
+        # split on '\n' alone since str.splitlines() also splits on characters like '\x85' or
+        # '\u2028' that can appear in the descriptions
+        for output in pkg_data.decode("utf-8").split("\n"):
+            # strip the '\r' of '\r\n' line endings from the pty, and skip empty lines
+            if not (output := output.removesuffix("\r")):
                 continue
             name, level, installed, desc = output[len(pkg_prefix):].split(pkg_sep, maxsplit=3)
             desc = desc.rstrip()
@@ -269,6 +385,36 @@ def get_optional_deps(package: str, docker_cmd: str, container_name: str,
     return optional_deps, installed_optional_deps
 
 
+def _display_till_header(deps_out: io.BufferedReader, header: bytes) -> bytes:
+    """
+    Display the output progressively till the given header line is found.
+
+    :param deps_out: the output stream of the command to determine optional dependencies
+    :param header: the header line that precedes the optional dependencies in the output
+    :return: the data read after the header line (or empty if header was not found)
+    """
+    # the incomplete last line seen so far which is required to match the header line
+    line = b""
+    # readline does not work for in-place updates like from aria2, so read whatever is
+    # available using read1 (rather than a byte at a time) and display it immediately
+    while chunk := deps_out.read1(_READ_CHUNK_SIZE):
+        data = line + chunk
+        line_start = 0
+        while eol := _EOL_RE.search(data, line_start):
+            if data[line_start:eol.start()] == header:
+                # display till the end of header line and return the rest for parsing;
+                # the header cannot be in the previous incomplete line since it has no EOL
+                header_end = eol.end()
+                sys.stdout.buffer.write(chunk[:header_end - len(line)])
+                return data[header_end:]
+            line_start = eol.end()
+        sys.stdout.buffer.write(chunk)
+        sys.stdout.flush()
+        # a line longer than the header cannot match it, so no need to keep all of it
+        line = data[line_start:line_start + len(header) + 1]
+    return b""
+
+
 def select_optional_deps(package: str, deps: list[tuple[str, str, int]]) -> list[str]:
     """
     Show a selection menu to the user having optional dependencies of a package to be installed.
@@ -317,52 +463,83 @@ def wrap_container_files(package: str, copy_type: CopyType, app_flags: dict[str,
     if isinstance(package_files, int):
         return []
     wrapper_files: list[str] = []
-    desktop_dirs = Consts.container_desktop_dirs()
-    icon_dir_pattern = re.compile(f"({')|('.join(Consts.container_icon_dirs())})")
     # map of found icons where key is the name of icon file (without extension) while the value
     # is a tuple with first one being a float inverse priority (lower is better) followed by path
     selected_icons: dict[str, tuple[float, str]] = {}
-    executable_dirs = Consts.container_bin_dirs()
+    # inverse priority of each directory checked against the icon directory pattern (None if
+    # it is not an icon directory) since the files of a package are grouped by directories
+    icon_dir_priorities: dict[str, Optional[float]] = {}
     man_dir_pattern = Consts.container_man_dir_pattern()
     # get the parsed container configuration
     parsed_box_conf = _get_parsed_box_conf(box_conf)
-    # read the container configuration for [app_flags] section
-    app_flags_section = parsed_box_conf["app_flags"] \
-        if parsed_box_conf and parsed_box_conf.has_section("app_flags") else None
-    file_paths = [(os.path.dirname(file), filename, file) for file in package_files.splitlines()
-                  if (filename := os.path.basename(file).strip())]  # empty name means directory
-
-    # if an executable from a package is skipped by user, then skip all of them for consistency
-    for file_dir, filename, file in file_paths:
-        if file_dir in executable_dirs:
+    # read the container configuration for [app_flags] section into a dict once to avoid the
+    # option lookup overhead of `SectionProxy` for each executable; the keys in the dict are
+    # as transformed by `optionxform` of the parser (e.g. lower-case for case-insensitive keys)
+    app_flags_map: dict[str, str] = {}
+    app_flags_key: Callable[[str], str] = str
+    if parsed_box_conf and parsed_box_conf.has_section("app_flags"):
+        app_flags_map = dict(parsed_box_conf.items("app_flags"))
+        app_flags_key = parsed_box_conf.optionxform
+    # classify the files of the package in a single pass
+    executables: list[tuple[str, str]] = []
+    desktop_files: list[tuple[str, str]] = []
+    man_pages: list[str] = []
+    for file in package_files.splitlines():
+        # split into directory and name in one go (paths in the listing are normalized)
+        file_dir, _, filename = file.rpartition("/")
+        if not (filename := filename.strip()):
+            continue  # empty name means directory
+        if file_dir in _EXECUTABLE_DIRS:
             # check for additional flags for the executables as specified in [app_flags] section
-            if app_flags_section and (flags := app_flags_section.get(filename)):
+            if app_flags_map and (flags := app_flags_map.get(app_flags_key(filename))):
                 # command-line --app-flags will override those in the configuration files
                 app_flags.setdefault(filename, flags)
-            if copy_type & CopyType.EXECUTABLE:
-                if not _can_wrap_executable(filename, file, conf, quiet):
-                    # clear EXECUTABLE mask so that no wrapper executable is created
-                    copy_type &= ~CopyType.EXECUTABLE
-
+            executables.append((filename, file))
+        elif copy_type & CopyType.DESKTOP and file_dir in _DESKTOP_DIRS:
+            # .desktop files are copied over later adding appropriate "docker exec" prefix
+            # to the command
+            desktop_files.append((filename, file))
+        elif copy_type & CopyType.DESKTOP and _select_app_icon(
+                file_dir, filename, file, _ICON_DIR_RE, icon_dir_priorities, selected_icons):
+            continue
+        elif shared_root and man_dir_pattern.match(file_dir):
+            man_pages.append(file)
+
+    if copy_type & CopyType.EXECUTABLE:
+        # if an executable from a package is skipped by user, then skip all of them for consistency
+        for filename, file in executables:
+            if not _can_wrap_executable(filename, file, conf, quiet):
+                # clear EXECUTABLE mask so that no wrapper executable is created
+                copy_type &= ~CopyType.EXECUTABLE
+                break
     # the "-it" flag is used for both desktop file and executable for podman/docker exec
     # since it is safe (unless the app may need stdin in which case Terminal must be true
     #   in its desktop file in which case a terminal will be opened during execution)
-    for file_dir, filename, file in file_paths:
-        # check if this is a .desktop directory and copy it over adding appropriate
-        # "docker exec" prefix to the command
-        if copy_type & CopyType.DESKTOP:
-            if file_dir in desktop_dirs:
-                _wrap_desktop_file(filename, file, docker_cmd, conf, app_flags, wrapper_files)
-                continue  # if it is a .desktop file, then skip executable check
-            if _select_app_icon(file_dir, filename, file, icon_dir_pattern, selected_icons):
-                continue  # if it is an icon file, then skip executable check
-        if copy_type & CopyType.EXECUTABLE:
-            if file_dir in executable_dirs:
-                _wrap_executable(filename, file, docker_cmd, conf, app_flags, wrapper_files)
-            elif shared_root and man_dir_pattern.match(file_dir):
-                _link_man_page(file, shared_root, conf, wrapper_files)
-    if selected_icons:
-        _copy_app_icons(selected_icons, docker_cmd, conf, quiet, wrapper_files)
+    if copy_type & CopyType.EXECUTABLE:
+        # create the target directories once for all the wrappers rather than for each file
+        if executables:
+            os.makedirs(conf.env.user_executables_dir, mode=Consts.default_directory_mode(),
+                        exist_ok=True)
+        for filename, file in executables:
+            _wrap_executable(filename, file, docker_cmd, conf, app_flags, wrapper_files)
+        man_dirs: set[str] = set()
+        for file in man_pages:
+            _link_man_page(file, shared_root, conf, man_dirs, wrapper_files)
+    app_icons = _confirm_app_icons(selected_icons, conf, quiet) if selected_icons else []
+    if desktop_files or app_icons:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            local_files = _fetch_container_files(
+                [file for _, file in desktop_files] + [icon for icon, _ in app_icons],
+                docker_cmd, conf.box_name, shared_root, temp_dir)
+            if desktop_files:
+                os.makedirs(conf.env.user_applications_dir, mode=Consts.default_directory_mode(),
+                            exist_ok=True)
+            # a failure for some of the files (e.g. dangling links) should not skip the others
+            for filename, file in desktop_files:
+                if os.path.exists(local_file := local_files[file]):
+                    _wrap_desktop_file(filename, file, local_file, docker_cmd, conf, app_flags,
+                                       wrapper_files)
+            _copy_app_icons(app_icons, local_files, wrapper_files)
 
     return wrapper_files
 
@@ -383,6 +560,23 @@ def _get_parsed_box_conf(box_conf: Union[str, ConfigParser]) -> Optional[ConfigP
         return ini_file_reader(box_conf_fd, interpolation=None, case_sensitive=False)
 
 
+def _expand_app_flags(flags: str, program: str, args: str) -> str:
+    """
+    Replace `!p` in a value of `[app_flags]` section with given `program` and `!a` with `args`
+    (see :func:`_replace_flags`).
+
+    :param flags: the value in `[app_flags]` section for `program` name as the key
+    :param program: the executable which can be its full path or the name
+    :param args: arguments to be passed to the `program`
+    :return: the `flags` after substitution of `!p` and `!a`
+    """
+    # skip the regex substitution when there is nothing to replace
+    if "!" not in flags:
+        return flags
+    return _FLAGS_RE.sub(functools.partial(_replace_flags, flags=flags, program=program,
+                                           args=args), flags)
+
+
 def _replace_flags(match: re.Match[str], flags: str, program: str, args: str) -> str:
     """
     `_FLAGS_RE.sub` callback to replace `!p` in a value of `[app_flags]` section with given
@@ -402,33 +596,66 @@ def _replace_flags(match: re.Match[str], flags: str, program: str, args: str) ->
     return args
 
 
-def docker_cp_action(docker_cmd: str, box_name: str, src: str,
-                     func: Callable[[str], None]) -> int:
+def docker_cp_files(docker_cmd: str, box_name: str, srcs: list[str], dest_dir: str) -> int:
     """
-    Copy a file from docker container to a temporary location on host and perform given action.
-    This does not use the `cp` command of podman/docker because it fails for rootless docker.
+    Copy files from docker container to a directory on host using a single podman/docker exec.
+    The files are placed below `dest_dir` with their full container paths (e.g. `/a/b.txt` is
+    copied to `<dest_dir>/a/b.txt`). This does not use the `cp` command of podman/docker because
+    it fails for rootless docker, and it can only copy a single path.
 
     :param docker_cmd: the podman/docker executable to use
     :param box_name: name of the ybox container
-    :param src: path of the file to be copied on the container
-    :param func: function that takes temporary copied file as an argument with no return
-    :return: exit code of the podman/docker command
-    """
-    src_dir = os.path.dirname(src)
-    src_file = os.path.basename(src)
-    with tempfile.TemporaryDirectory() as temp_dir:
-        # use shell pipe and tar instead of python Popen and tarfile which will require much more
-        # code unncessarily and may not be able to use `run_command`
-        shell_cmd = (f"'{docker_cmd}' exec '{box_name}' tar -C '{src_dir}' -chpf - '{src_file}' | "
-                     f"tar -C '{temp_dir}' -xpf -")
-        if (code := int(run_command(["/bin/sh", "-c", shell_cmd], exit_on_error=False,
-                                    error_msg=f"copying of file from '{box_name}:{src}'"))) == 0:
-            func(f"{temp_dir}/{src_file}")
-        return code
+    :param srcs: absolute paths of the files to be copied on the container
+    :param dest_dir: the directory on host where the files have to be copied
+    :return: exit code of the shell pipeline which is that of the extracting `tar` on the host,
+             so a file missing in the container is not reported here and is only skipped
+             in the copy (others are still copied), hence callers should check for the copies
+    """
+    # use shell pipe and tar instead of python Popen and tarfile which will require much more
+    # code unncessarily and may not be able to use `run_command`
+    src_paths = " ".join(shlex.quote(src.lstrip("/")) for src in srcs)
+    shell_cmd = (f"{shlex.quote(docker_cmd)} exec {shlex.quote(box_name)} tar -C / -chpf - "
+                 f"{src_paths} | tar -C {shlex.quote(dest_dir)} -xpf -")
+    return int(run_command(["/bin/sh", "-c", shell_cmd], exit_on_error=False,
+                           error_msg=f"copying of files from '{box_name}'"))
+
 
+def _fetch_container_files(files: list[str], docker_cmd: str, box_name: str, shared_root: str,
+                           fetch_dir: str) -> dict[str, str]:
+    """
+    Get local paths for the given files of the container. If `shared_root` is provided for the
+    container, then the files are read directly from there, else they are copied to `fetch_dir`
+    using a single podman/docker exec.
 
-def _wrap_desktop_file(filename: str, file: str, docker_cmd: str, conf: StaticConfiguration,
-                       app_flags: dict[str, str], wrapper_files: list[str]) -> None:
+    :param files: absolute paths of the files in the container
+    :param docker_cmd: the podman/docker executable to use
+    :param box_name: name of the ybox container
+    :param shared_root: the local shared root directory if `shared_root` is provided
+                        for the container
+    :param fetch_dir: the local directory where the files that have to be copied are placed
+    :return: map of the files in the container to their local paths (which may not exist
+             if the copy failed for some of them)
+    """
+    local_files: dict[str, str] = {}
+    fetch_files: list[str] = []
+    real_shared_root = f"{os.path.realpath(shared_root)}/" if shared_root else ""
+    for file in files:
+        # symlinks in the shared root can point to absolute paths that are only valid inside
+        # the container, so fetch the files that do not resolve to a path in the shared root
+        if real_shared_root and os.path.realpath(local_file := f"{shared_root}{file}").startswith(
+                real_shared_root):
+            local_files[file] = local_file
+        else:
+            local_files[file] = f"{fetch_dir}{file}"
+            fetch_files.append(file)
+    if fetch_files:
+        docker_cp_files(docker_cmd, box_name, fetch_files, fetch_dir)
+    return local_files
+
+
+def _wrap_desktop_file(filename: str, file: str, local_file: str, docker_cmd: str,
+                       conf: StaticConfiguration, app_flags: dict[str, str],
+                       wrapper_files: list[str]) -> None:
     """
     For a desktop file, add "podman/docker exec ..." to its Exec/TryExec lines. Also read
     the additional flags for the command passed in `app_flags` and add them to an appropriate
@@ -436,6 +663,7 @@ def _wrap_desktop_file(filename: str, file: str, docker_cmd: str, conf: StaticCo
 
     :param filename: name of the desktop file being wrapped
     :param file: full path of the desktop file being wrapped
+    :param local_file: path of the local copy of the desktop file fetched from the container
     :param docker_cmd: the podman/docker executable to use
     :param conf: the :class:`StaticConfiguration` for the container
     :param app_flags: map of executable file name to the value from [app_flags] section from the
@@ -444,38 +672,36 @@ def _wrap_desktop_file(filename: str, file: str, docker_cmd: str, conf: StaticCo
     """
     # container name is added to desktop file to make it unique
     wrapper_name = f"ybox.{conf.box_name}.{filename}"
+    # pseudo-tty cannot be allocated with rootless docker outside of a terminal app
+    exec_prefix = (f'{docker_cmd} exec {_EXEC_ENV_OPTS} {conf.box_name} '
+                   '/usr/local/bin/run-in-dir ""')
 
     def replace_executable(match: re.Match[str]) -> str:
         program = match.group(3)
         args = match.group(4)
         # check for additional flags to be added
         if flags := app_flags.get(os.path.basename(program), ""):
-            full_cmd = _FLAGS_RE.sub(
-                lambda f_match: _replace_flags(f_match, flags, program, args), flags)
+            full_cmd = _expand_app_flags(flags, program, args)
         elif args:
             full_cmd = f"{program} {args}"
         else:
             full_cmd = program
-        # pseudo-tty cannot be allocated with rootless docker outside of a terminal app
-        return (f'{match.group(1)}{docker_cmd} exec -e=XAUTHORITY -e=DISPLAY '
-                f'-e=FREETYPE_PROPERTIES {conf.box_name} /usr/local/bin/run-in-dir '
-                f'"" {full_cmd}\n')
-
-    # the destination will be $HOME/.local/share/applications
-    os.makedirs(conf.env.user_applications_dir, mode=Consts.default_directory_mode(),
-                exist_ok=True)
+        return f"{match.group(1)}{exec_prefix} {full_cmd}\n"
+
+    # the destination will be $HOME/.local/share/applications (created by the caller)
     wrapper_file = f"{conf.env.user_applications_dir}/{wrapper_name}"
     print_notice(f"Linking container desktop file {file} to {wrapper_file}")
 
-    def write_desktop_file(src: str) -> None:
-        with open(wrapper_file, "w", encoding="utf-8") as wrapper_fd:
-            with open(src, "r", encoding="utf-8") as src_fd:
-                wrapper_fd.writelines(_EXEC_RE.sub(replace_executable, line) for line in src_fd)
-    if docker_cp_action(docker_cmd, conf.box_name, file, write_desktop_file) == 0:
-        wrapper_files.append(wrapper_file)
+    with open(wrapper_file, "w", encoding="utf-8") as wrapper_fd:
+        with open(local_file, "r", encoding="utf-8") as src_fd:
+            # most lines are not Exec/TryExec ones, so skip the regex substitution for those
+            wrapper_fd.writelines(_EXEC_RE.sub(replace_executable, line) if "Exec" in line
+                                  else line for line in src_fd)
+    wrapper_files.append(wrapper_file)
 
 
 def _select_app_icon(file_dir: str, filename: str, file: str, icon_dir_pattern: re.Pattern[str],
+                     icon_dir_priorities: dict[str, Optional[float]],
                      selected_icons: dict[str, tuple[float, str]]) -> bool:
     """
     Check if given file is an application icon file and fill in the given dict of `selected_icons`
@@ -488,10 +714,35 @@ def _select_app_icon(file_dir: str, filename: str, file: str, icon_dir_pattern:
     :param icon_dir_pattern: a regular expression of the form `(<dir1>|<dir2>|...)` capturing all
                              the standard icon directories and also separately capture icon size
                              for directory of the form `/path/64x64/...` (i.e. capture `64`)
+    :param icon_dir_priorities: cache of directories already matched against `icon_dir_pattern`
+                                to their inverse priority, or `None` if the directory is not an
+                                icon directory; this is updated for a new `file_dir`
     :param selected_icons: dictionary of icon names (i.e. file name without extension) to a tuple
                            having inverse priority as a float and full path of the icon file
     :return: `True` if `file_dir` was one of the app icon directories else `False`
     """
+    if file_dir in icon_dir_priorities:
+        inv_priority = icon_dir_priorities[file_dir]
+    else:
+        inv_priority = icon_dir_priorities[file_dir] = _get_icon_dir_priority(file_dir,
+                                                                              icon_dir_pattern)
+    if inv_priority is not None:
+        icon_name = os.path.splitext(filename)[0]  # name is without extension
+        if not (existing := selected_icons.get(icon_name)) or inv_priority < existing[0]:
+            selected_icons[icon_name] = (inv_priority, file)
+        return True
+    return False
+
+
+def _get_icon_dir_priority(file_dir: str, icon_dir_pattern: re.Pattern[str]) -> Optional[float]:
+    """
+    Get the inverse priority (lower is better) of a directory having application icons.
+
+    :param file_dir: the directory to be checked
+    :param icon_dir_pattern: a regular expression for the standard icon directories as described
+                             in :func:`_select_app_icon`
+    :return: inverse priority as a float if `file_dir` is an app icon directory else `None`
+    """
     if icon_match := icon_dir_pattern.fullmatch(file_dir):
         # find index of the first pattern that matched
         match_groups = icon_match.groups()
@@ -500,51 +751,76 @@ def _select_app_icon(file_dir: str, filename: str, file: str, icon_dir_pattern:
         if len(match_groups) >= dir_idx + 2 and (icon_dim_str := icon_match.group(
                 dir_idx + 2)) and (icon_dim := float(icon_dim_str)) < 1024:
             # larger `icon_dim` should give smaller `inv_priority`, hence (1.0 - ...)
-            inv_priority = dir_idx + 1.0 - icon_dim / 1024.0
-        else:
-            inv_priority = float(dir_idx)
-        icon_name = Path(filename).stem  # name is without extension
-        if not (existing := selected_icons.get(icon_name)) or inv_priority < existing[0]:
-            selected_icons[icon_name] = (inv_priority, file)
-        return True
-    return False
+            return dir_idx + 1.0 - icon_dim / 1024.0
+        return float(dir_idx)
+    return None
 
 
-def _copy_app_icons(selected_icons: dict[str, tuple[float, str]], docker_cmd: str,
-                    conf: StaticConfiguration, quiet: int, wrapper_files: list[str]) -> None:
+def _confirm_app_icons(selected_icons: dict[str, tuple[float, str]], conf: StaticConfiguration,
+                       quiet: int) -> list[tuple[str, str]]:
     """
-    Copy application icons (as accumulated in `selected_icons`) from the container to user's
-    standard application icon directory. It will also ask for confirmation (if `-q/--quiet` flag
-      was not pass) if an icon with same name already exists in user's directory.
+    Determine the application icons (as accumulated in `selected_icons`) that have to be copied
+    from the container to user's standard application icon directory. It will also ask for
+    confirmation (if `-q/--quiet` flag was not pass) if an icon with same name already exists
+    in user's directory.
 
     :param selected_icons: dictionary of icon names (i.e. file name without extension) to a tuple
                            having inverse priority as a float and full path of the icon file
-    :param docker_cmd: the podman/docker executable to use
     :param conf: the :class:`StaticConfiguration` for the container
     :param quiet: perform operations quietly: a value != 0 will skip overwriting existing icon
                   file in user's application icon directory without confirmation
-    :param wrapper_files: the accumulated list of all wrapper files so far
+    :return: list of tuples having the full path of the icon file in the container and the
+             target path of the icon file on the host
     """
-    target_icon_dir = Path(conf.env.user_base, "share", "icons")
+    target_icon_dir = f"{conf.env.user_base}/share/icons"
     os.makedirs(target_icon_dir, mode=Consts.default_directory_mode(), exist_ok=True)
+    # scan the target directory once and map each name prefix ending before a '.' to the
+    # existing files to get the equivalent of `glob("<icon_name>.*")` for each icon cheaply
+    existing_icons_map: dict[str, list[str]] = {}
+    with os.scandir(target_icon_dir) as entries:
+        for entry in entries:
+            if (name := entry.name).startswith("."):
+                continue  # glob skips hidden files
+            dot_idx = name.find(".")
+            while dot_idx != -1:
+                existing_icons_map.setdefault(name[:dot_idx], []).append(entry.path)
+                dot_idx = name.find(".", dot_idx + 1)
+    app_icons: list[tuple[str, str]] = []
     for icon_name, (_, icon_path) in selected_icons.items():
-        if existing_icons := [str(p) for p in target_icon_dir.glob(f"{icon_name}.*")]:
+        if existing_icons := existing_icons_map.get(icon_name):
             resp = input(f"Application icon(s) [{' '.join(existing_icons)}] already present. "
                          "Override? (y/N) ") if quiet == 0 else "N"
             if resp.strip().lower() != "y":
                 print_warn(f"Skipping copying of application icon {icon_path}")
                 continue
-        target_icon_path = target_icon_dir.joinpath(os.path.basename(icon_path))
+        app_icons.append((icon_path, f"{target_icon_dir}/{os.path.basename(icon_path)}"))
+    return app_icons
+
+
+def _copy_app_icons(app_icons: list[tuple[str, str]], local_files: dict[str, str],
+                    wrapper_files: list[str]) -> None:
+    """
+    Copy application icons fetched from the container to user's standard application icon
+    directory.
+
+    :param app_icons: list of tuples having the full path of the icon file in the container and
+                      the target path of the icon file as returned by :func:`_confirm_app_icons`
+    :param local_files: map of the icon files in the container to their local paths as
+                        returned by :func:`_fetch_container_files`
+    :param wrapper_files: the accumulated list of all wrapper files so far
+    """
+    for icon_path, target_icon_path in app_icons:
+        if not os.path.exists(local_icon_path := local_files[icon_path]):
+            continue
         print_notice(f"Copying application icon file {icon_path} to {target_icon_path}")
         # copy from temporary file over the existing one, if any, to overwrite rather than move
         # (which will preserve all of its hard links, for example)
-        exists = os.path.exists(target_icon_path)
-        if docker_cp_action(docker_cmd, conf.box_name, icon_path,
-                            lambda src, dest=target_icon_path: shutil.copy2(src, dest)) == 0:
-            # skip registration of icon file it already existed and was overwritten so that
-            # it is not removed on package uninstall
-            if not exists:
-                wrapper_files.append(str(target_icon_path))
+        exists = os.path.lexists(target_icon_path)
+        shutil.copy2(local_icon_path, target_icon_path)
+        # skip registration of icon file it already existed and was overwritten so that
+        # it is not removed on package uninstall
+        if not exists:
+            wrapper_files.append(target_icon_path)
 
 
 def _can_wrap_executable(filename: str, file: str, conf: StaticConfiguration, quiet: int) -> bool:
@@ -593,23 +869,25 @@ def _wrap_executable(filename: str, file: str, docker_cmd: str, conf: StaticConf
                       container configuration
     :param wrapper_files: the accumulated list of all wrapper files so far
     """
-    os.makedirs(conf.env.user_executables_dir, mode=Consts.default_directory_mode(),
-                exist_ok=True)
     wrapper_exec = _get_wrapper_executable(filename, conf)
     print_notice(f"Linking container executable {file} to {wrapper_exec}")
     # ensure to change working directory to same on as on host if possible using `run-in-dir`
     # check for additional flags to be added
     if flags := app_flags.get(filename, ""):
-        full_cmd = '/usr/local/bin/run-in-dir "`pwd`" ' + _FLAGS_RE.sub(
-            lambda f_match: _replace_flags(f_match, flags, f'"{file}"', '"$@"'), flags)
+        full_cmd = '/usr/local/bin/run-in-dir "`pwd`" ' + _expand_app_flags(
+            flags, f'"{file}"', '"$@"')
     else:
         full_cmd = f'/usr/local/bin/run-in-dir "`pwd`" "{file}" "$@"'
-    exec_content = ("#!/bin/sh\n",
-                    f"exec {docker_cmd} exec -it -e=XAUTHORITY -e=DISPLAY "
-                    f"-e=FREETYPE_PROPERTIES {conf.box_name} ", full_cmd)
-    with open(wrapper_exec, "w", encoding="utf-8") as wrapper_fd:
-        wrapper_fd.writelines(exec_content)
-    os.chmod(wrapper_exec, mode=0o755, follow_symlinks=True)
+    exec_content = (f"#!/bin/sh\nexec {docker_cmd} exec -it {_EXEC_ENV_OPTS} {conf.box_name} "
+                    f"{full_cmd}").encode("utf-8")
+    # write and set the permissions using the same file descriptor
+    wrapper_fd = os.open(wrapper_exec, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o755)
+    try:
+        os.write(wrapper_fd, exec_content)
+        # explicitly set the mode since an existing file or umask can make it different
+        os.fchmod(wrapper_fd, 0o755)
+    finally:
+        os.close(wrapper_fd)
     wrapper_files.append(wrapper_exec)
 
 
@@ -619,20 +897,29 @@ def _get_wrapper_executable(filename: str, conf: StaticConfiguration) -> str:
 
 
 def _link_man_page(file: str, shared_root: str, conf: StaticConfiguration,
-                   wrapper_files: list[str]) -> None:
+                   man_dirs: set[str], wrapper_files: list[str]) -> None:
     """
-    For an executable, create a wrapper executable that invokes "podman/docker exec".
+    Create a symlink in user's man page directory to a man page of the container which is
+    accessed through its `shared_root`.
 
-    :param file: full path of the executable file being wrapped
+    :param file: full path of the man page in the container
     :param shared_root: the local shared root directory if `shared_root` is provided
                         for the container
     :param conf: the :class:`StaticConfiguration` for the container
+    :param man_dirs: set of the local man page directories created so far which is updated
+                     by this method
     :param wrapper_files: the accumulated list of all wrapper files so far
     """
     man_dir_base = file.index("/man/")  # expect /man/ to exist in the file path
-    linked_man_page = Path(conf.env.user_base, "share", "man", file[man_dir_base + 5:])
+    linked_man_page = f"{conf.env.user_base}/share/man/{file[man_dir_base + 5:]}"
     print_notice(f"Linking man page {file} to {linked_man_page}")
-    linked_man_page.parent.mkdir(parents=True, exist_ok=True)
-    linked_man_page.unlink(missing_ok=True)
-    linked_man_page.symlink_to(f"{shared_root}{file}")
-    wrapper_files.append(str(linked_man_page))
+    # man pages of a package are typically in a few directories, so create each only once
+    if (man_dir := os.path.dirname(linked_man_page)) not in man_dirs:
+        os.makedirs(man_dir, exist_ok=True)
+        man_dirs.add(man_dir)
+    try:
+        os.unlink(linked_man_page)
+    except FileNotFoundError:
+        pass
+    os.symlink(f"{shared_root}{file}", linked_man_page)
+    wrapper_files.append(linked_man_page)
@@ -7,7 +7,7 @@ import subprocess
 import time
 from configparser import SectionProxy
 
-from ybox.cmd import (PkgMgr, build_shell_command, check_active_ybox,
+from ybox.cmd import (PkgMgr, build_shell_command, get_active_yboxes,
                       run_command)
 from ybox.config import StaticConfiguration
 from ybox.print import (fgcolor, print_color, print_error, print_info,
@@ -34,8 +34,9 @@ def repair_package_state(args: argparse.Namespace, pkgmgr: SectionProxy, docker_
     quiet_flag = pkgmgr[PkgMgr.QUIET_FLAG.value] if quiet else ""
     # find all the containers sharing the same shared root
     if runtime_conf.shared_root:
+        active_containers = get_active_yboxes(docker_cmd)
         containers = [c for c in state.get_containers(shared_root=runtime_conf.shared_root)
-                      if check_active_ybox(docker_cmd, c)]
+                      if c in active_containers]
     else:
         containers = [conf.box_name]
     # first check for active package operations across all containers on the same shared root
@@ -8,7 +8,7 @@ import time
 
 from ybox.cmd import check_active_ybox, get_ybox_state, run_command
 from ybox.config import StaticConfiguration
-from ybox.env import Environ, get_docker_command
+from ybox.env import get_docker_command, get_environ
 from ybox.print import fgcolor, print_color, print_error
 from ybox.util import wait_for_ybox_container
 
@@ -35,7 +35,7 @@ def start_container(docker_cmd: str, container_name: str):
             print_color(f"Starting ybox container '{container_name}'", fg=fgcolor.cyan)
             run_command([docker_cmd, "container", "start", container_name],
                         error_msg="container start")
-            conf = StaticConfiguration(Environ(docker_cmd), status[1], container_name)
+            conf = StaticConfiguration(get_environ(docker_cmd), status[1], container_name)
             wait_for_ybox_container(docker_cmd, conf)
     else:
         print_error(f"No ybox container '{container_name}' found")
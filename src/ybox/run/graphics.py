@@ -2,10 +2,14 @@
 Methods for setting up graphics in the container including X11/Wayland, NVIDIA etc.
 """
 
+import fnmatch
 import glob
 import os
+import re
+import stat
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import lru_cache
 from itertools import chain
-from os.path import realpath
 from typing import Iterable, Optional
 
 from ybox.config import Consts, StaticConfiguration
@@ -18,7 +22,7 @@ _STD_LIB_DIRS = ["/usr/lib", "/lib", "/usr/local/lib", "/usr/lib64", "/lib64",
 # the '&' in front of the paths is an indicator to the code that this is a glob pattern
 _STD_LIB_DIR_PATTERNS = ["&/usr/lib/*-linux-gnu", "&/lib/*-linux-gnu", "&/usr/lib64/*-linux-gnu",
                          "&/lib64/*-linux-gnu", "&/usr/lib32/*-linux-gnu", "&/lib32/*-linux-gnu"]
-_STD_LD_LIB_PATH_VARS = ["LD_LIBRARY_PATH", "LD_LIBRARY_PATH_64", "LD_LIBRARY_PATH_32"]
+_STD_LD_LIB_PATH_VARS = ("LD_LIBRARY_PATH", "LD_LIBRARY_PATH_64", "LD_LIBRARY_PATH_32")
 _NVIDIA_LIB_PATTERNS = ["*nvidia*.so*", "*NVIDIA*.so*", "libcuda*.so*", "libnvcuvid*.so*",
                         "libnvoptix*.so*", "gbm/*nvidia*.so*", "vdpau/*nvidia*.so*"]
 _NVIDIA_BIN_PATTERNS = ["nvidia-smi", "nvidia-cuda*", "nvidia-debug*", "nvidia-bug*"]
@@ -28,6 +32,29 @@ _NVIDIA_DATA_PATTERNS = ["/usr/share/nvidia", "/usr/local/share/nvidia", "/lib/f
                          "/usr/share/egl/*/*nvidia*", "/usr/share/glvnd/*/*nvidia*",
                          "/usr/share/vulkan/*/*nvidia*"]
 _LD_SO_CONF = "/etc/ld.so.conf"
+# maximum number of threads used to scan the directories for NVIDIA artifacts
+_SCAN_THREADS = 8
+
+
+def _compile_name_patterns(patterns: Iterable[str]) -> dict[str, re.Pattern[str]]:
+    """
+    Compile glob patterns, that can have an optional sub-directory prefix, into a single regular
+    expression per sub-directory that matches the file names.
+
+    :param patterns: glob patterns of the form `<name-pattern>` or `<subdir>/<name-pattern>`
+    :return: dictionary of sub-directory (empty for none) to the combined regular expression
+             for all the name patterns in that sub-directory
+    """
+    subdir_patterns: dict[str, list[str]] = {}
+    for pat in patterns:
+        subdir, _, name_pat = pat.rpartition("/")
+        subdir_patterns.setdefault(subdir, []).append(fnmatch.translate(name_pat))
+    return {subdir: re.compile("|".join(pats)) for subdir, pats in subdir_patterns.items()}
+
+
+# compiled forms of _NVIDIA_LIB_PATTERNS and _NVIDIA_BIN_PATTERNS used to filter directories
+_NVIDIA_LIB_NAME_PATTERNS = _compile_name_patterns(_NVIDIA_LIB_PATTERNS)
+_NVIDIA_BIN_NAME_PATTERNS = _compile_name_patterns(_NVIDIA_BIN_PATTERNS)
 
 
 def add_env_option(docker_args: list[str], env_var: str, env_val: Optional[str] = None) -> None:
@@ -75,7 +102,7 @@ def enable_x11(docker_args: list[str], env: Environ) -> None:
     xsock = "/tmp/.X11-unix"
     if os.access(xsock, os.R_OK):
         add_mount_option(docker_args, xsock, xsock, "ro")
-    if xauth := os.environ.get("XAUTHORITY"):
+    if xauth := os.getenv("XAUTHORITY"):
         # XAUTHORITY file may change after a restart or login (e.g. with Xwayland), so mount some
         # parent directory which is adjusted by run-in-dir script if it has changed;
         # For now the known common parents are used below since using just the immediate
@@ -106,7 +133,7 @@ def enable_wayland(docker_args: list[str], env: Environ) -> None:
     :param docker_args: list of podman/docker arguments to which the options have to be appended
     :param env: an instance of the current :class:`Environ`
     """
-    if env.xdg_rt_dir and (wayland_display := os.environ.get("WAYLAND_DISPLAY")):
+    if env.xdg_rt_dir and (wayland_display := os.getenv("WAYLAND_DISPLAY")):
         add_env_option(docker_args, "WAYLAND_DISPLAY", wayland_display)
         wayland_sock = f"{env.xdg_rt_dir}/{wayland_display}"
         if os.access(wayland_sock, os.W_OK):
@@ -139,13 +166,20 @@ def enable_nvidia(docker_args: list[str], conf: StaticConfiguration) -> None:
     :param docker_args: list of podman/docker arguments to which the options have to be appended
     :param conf: the :class:`StaticConfiguration` for the container
     """
-    # search for nvidia device files and add arguments for those
-    for nvidia_dev in _find_nvidia_devices():
-        docker_args.append(f"--device={nvidia_dev}")
-    # gather the library directories from standard paths, LD_LIBRARY_PATH* and /etc/ld.so.conf
-    lib_dirs = _find_all_lib_dirs()
-    # find the list of nvidia library directories to be mounted in the target container
-    nvidia_lib_dirs = _filter_nvidia_dirs(lib_dirs, _NVIDIA_LIB_PATTERNS)
+    # the directory scans below are I/O bound, so run the independent ones in a thread pool
+    with ThreadPoolExecutor(max_workers=_SCAN_THREADS) as executor:
+        # search for nvidia device files in parallel with the gathering of library directories
+        nvidia_devs = executor.submit(_find_nvidia_devices)
+        # gather library directories from standard paths, LD_LIBRARY_PATH* and /etc/ld.so.conf
+        lib_dirs = _find_all_lib_dirs(executor)
+        # find the list of nvidia library and binary directories to be mounted in the container
+        nvidia_lib_dirs = _filter_nvidia_dirs(lib_dirs, _NVIDIA_LIB_NAME_PATTERNS, executor)
+        nvidia_bin_dirs = _filter_nvidia_dirs(
+            {_realpath(d) for d in Consts.container_bin_dirs()}, _NVIDIA_BIN_NAME_PATTERNS,
+            executor)
+        # add arguments for the nvidia device files
+        for nvidia_dev in nvidia_devs.result():
+            docker_args.append(f"--device={nvidia_dev}")
     # add the directories to tbe mounted to podman/docker arguments
     mount_nvidia_subdir = conf.target_scripts_dir
     mount_lib_dirs = _prepare_mount_dirs(nvidia_lib_dirs, docker_args,
@@ -155,8 +189,6 @@ def enable_nvidia(docker_args: list[str], conf: StaticConfiguration) -> None:
     nvidia_setup = _create_nvidia_setup(docker_args, nvidia_lib_dirs, mount_lib_dirs)
 
     # mount nvidia binary directories and add code to script to link to them in container
-    nvidia_bin_dirs = _filter_nvidia_dirs({realpath(d) for d in Consts.container_bin_dirs()},
-                                          _NVIDIA_BIN_PATTERNS)
     mount_bin_dirs = _prepare_mount_dirs(nvidia_bin_dirs, docker_args,
                                          f"{mount_nvidia_subdir}/mnt_bin")
     _add_nvidia_bin_links(mount_bin_dirs, nvidia_setup)
@@ -173,30 +205,65 @@ def enable_nvidia(docker_args: list[str], conf: StaticConfiguration) -> None:
 
 def _find_nvidia_devices() -> list[str]:
     """
-    Return the list of NVIDIA device files in /dev by matching against appropriate glob patterns.
+    Return the list of NVIDIA device files in /dev i.e. the `/dev/nvidia*` files and all the
+    files in `/dev/nvidia*` directories (recursively).
     """
-    return [p for p in chain(glob.glob("/dev/nvidia*"), glob.glob(
-        "/dev/nvidia*/**/*", recursive=True)) if not os.path.isdir(p)]
-
-
-def _find_all_lib_dirs() -> Iterable[str]:
+    devices: list[str] = []
+    # directories to be scanned with the required prefix of the names in that directory
+    pending = [("/dev", "nvidia")]
+    while pending:
+        scan_dir, prefix = pending.pop()
+        try:
+            with os.scandir(scan_dir) as entries:
+                for entry in entries:
+                    if not entry.name.startswith(prefix) or entry.name[0] == ".":
+                        continue
+                    # use the file type cached in DirEntry, and avoid following symlinks
+                    # when recursing to avoid cycles
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append((entry.path, ""))
+                    elif not entry.is_dir():
+                        devices.append(entry.path)
+        except OSError:
+            continue
+    return devices
+
+
+def _find_all_lib_dirs(executor: Optional[Executor] = None) -> Iterable[str]:
     """
     Return the list of all the library directories used by the system for shared libraries which
     includes the LD_LIBRARY_PATH, /etc/ld.so.conf and standard library paths.
+
+    :param executor: optional `Executor` used to resolve and check the directories concurrently
     """
     # add LD_LIBRARY_PATH components, then /etc/ld.so.conf and then standard library paths
-    ld_libs: list[str] = []
-    for lib_path_var in _STD_LD_LIB_PATH_VARS:
-        if ld_lib := os.environ.get(lib_path_var):
-            ld_libs.extend(ld_lib.split(os.pathsep))
+    ld_libs = list(chain.from_iterable(ld_lib.split(os.pathsep) for var in _STD_LD_LIB_PATH_VARS
+                                       if (ld_lib := os.getenv(var))))
     _parse_ld_so_conf(_LD_SO_CONF, ld_libs)
+    candidates = [d for p in chain(ld_libs, _STD_LIB_DIRS, _STD_LIB_DIR_PATTERNS) if p
+                  for d in (glob.glob(p[1:]) if p[0] == "&" else (p,))]
+    # the stat calls for the candidates are independent of each other, so submit all of them
+    # together to the executor, if available
+    resolved_dirs = executor.map(_resolve_dir, candidates) if executor else map(
+        _resolve_dir, candidates)
     # using dict with None values instead of set to preserve order while keeping keys unique
-    lib_dirs = {r: None for p in chain(ld_libs, _STD_LIB_DIRS, _STD_LIB_DIR_PATTERNS)
-                for d in (glob.glob(p[1:]) if p[0] == "&" else (p,))
-                if (r := realpath(d)) and os.path.isdir(r)}
+    lib_dirs = {r: None for r in resolved_dirs if r}
     return lib_dirs.keys()
 
 
+def _resolve_dir(path: str) -> str:
+    """return the fully resolved `path` if it is a directory, else an empty string"""
+    # check with a single stat (which follows symlinks) before resolving the path with
+    # realpath that needs a stat for every component
+    return _realpath(path) if os.path.isdir(path) else ""
+
+
+@lru_cache(maxsize=1024)
+def _realpath(path: str) -> str:
+    """cached `os.path.realpath` since the NVIDIA setup resolves many overlapping paths"""
+    return os.path.realpath(path)
+
+
 def _parse_ld_so_conf(conf: str, ld_lib_paths: list[str]) -> None:
     """
     Read /etc/ld.so.conf and append all the mentioned library directories (including the
@@ -208,33 +275,48 @@ def _parse_ld_so_conf(conf: str, ld_lib_paths: list[str]) -> None:
     """
     if not os.access(conf, os.R_OK):
         return
-    with open(conf, "r", encoding="utf-8") as conf_fd:
-        while line := conf_fd.readline():
-            if not (line := line.strip()) or line[0] == '#':
-                continue
-            if words := line.split():
-                if words[0].lower() == "include":
-                    for inc in glob.glob(words[1]):
-                        _parse_ld_so_conf(inc, ld_lib_paths)
-                else:
-                    ld_lib_paths.append(realpath(line))
+    # the file is small, so read it in one go as bytes and decode only the required parts
+    with open(conf, "rb") as conf_fd:
+        data = conf_fd.read()
+    for line in data.splitlines():
+        if not (line := line.strip()) or line[:1] == b"#":
+            continue
+        words = line.split()
+        if words[0].lower() == b"include":
+            for inc in glob.glob(words[1].decode("utf-8")):
+                _parse_ld_so_conf(inc, ld_lib_paths)
+        else:
+            ld_lib_paths.append(_realpath(line.decode("utf-8")))
 
 
-def _filter_nvidia_dirs(dirs: Iterable[str], patterns: list[str]) -> list[str]:
+def _filter_nvidia_dirs(dirs: Iterable[str], name_patterns: dict[str, re.Pattern[str]],
+                        executor: Optional[Executor] = None) -> list[str]:
     """
     Filter out the directories having NVIDIA artifacts from the given `dirs`.
 
     :param dirs: an `Iterable` of directory paths that are checked for NVIDIA artifacts
-    :param patterns: directory or file patterns to search in `dirs`
+    :param name_patterns: file name patterns per sub-directory to search in `dirs` as
+                          returned by :func:`_compile_name_patterns`
+    :param executor: optional `Executor` used to scan the directories concurrently
     :return: list of filtered directories that contain an NVIDIA artifact
     """
     def has_nvidia_artifact(d: str) -> bool:
-        for pat in patterns:
-            if glob.glob(f"{d}/{pat}"):
-                return True
+        # scan each directory (or its sub-directory for patterns like gbm/*) only once
+        for subdir, name_pattern in name_patterns.items():
+            try:
+                with os.scandir(f"{d}/{subdir}" if subdir else d) as entries:
+                    # skip hidden files like glob does since fnmatch patterns match those too
+                    if any(name_pattern.match(name) for entry in entries
+                           if not (name := entry.name).startswith(".")):
+                        return True
+            except OSError:
+                continue
         return False
 
-    return [nvidia_dir for nvidia_dir in dirs if has_nvidia_artifact(nvidia_dir)]
+    dirs = list(dirs)
+    has_artifacts = executor.map(has_nvidia_artifact, dirs) if executor else map(
+        has_nvidia_artifact, dirs)
+    return [nvidia_dir for nvidia_dir, has_artifact in zip(dirs, has_artifacts) if has_artifact]
 
 
 def _prepare_mount_dirs(dirs: list[str], docker_args: list[str],
@@ -280,27 +362,26 @@ def _create_nvidia_setup(docker_args: list[str], src_dirs: list[str],
     ld_lib_path: list[str] = []
     for idx, mount_lib_dir in enumerate(mount_lib_dirs):
         target_lib_dir = f"{target_dir}/lib{idx}"
-        setup_script.append(f"rm -rf {target_lib_dir}")
-        setup_script.append(f"mkdir -p {target_lib_dir} && chmod 0755 {target_lib_dir}")
+        setup_script.extend((f"rm -rf {target_lib_dir}",
+                             f"mkdir -p {target_lib_dir} && chmod 0755 {target_lib_dir}"))
+        link_libs = f"  ln -s $libs {target_lib_dir}/. 2>/dev/null"
         for pat in _NVIDIA_LIB_PATTERNS:
-            setup_script.append(f'libs="$(compgen -G "{mount_lib_dir}/{pat}")"')
-            setup_script.append('if [ "$?" -eq 0 ]; then')
-            setup_script.append(f"  ln -s $libs {target_lib_dir}/. 2>/dev/null")
+            setup_script.extend((f'libs="$(compgen -G "{mount_lib_dir}/{pat}")"',
+                                 'if [ "$?" -eq 0 ]; then', link_libs))
             # if host library is in a sub-directory then create sub-directory on target too
             if (slash_index := pat.find("/")) != -1:
                 # check for corresponding library in host path and /usr/lib
                 pat_subdir = pat[:slash_index]
                 src_dir = f"{src_dirs[idx]}/{pat_subdir}"
                 usr_lib_dir = f"/usr/lib/{pat_subdir}"
-                setup_script.append(
-                    f'  if compgen -G "{src_dirs[idx]}/lib{pat_subdir}.so*" >/dev/null; then')
-                setup_script.append(f"    mkdir -p {src_dir} && chmod 0755 {src_dir}")
-                setup_script.append(f"    ln -s $libs {src_dir}/. 2>/dev/null")
-                setup_script.append(
-                    f'  elif compgen -G "/usr/lib/lib{pat_subdir}.so*" >/dev/null; then')
-                setup_script.append(f"    mkdir -p {usr_lib_dir} && chmod 0755 {usr_lib_dir}")
-                setup_script.append(f"    ln -s $libs {usr_lib_dir}/. 2>/dev/null")
-                setup_script.append("  fi")
+                setup_script.extend((
+                    f'  if compgen -G "{src_dirs[idx]}/lib{pat_subdir}.so*" >/dev/null; then',
+                    f"    mkdir -p {src_dir} && chmod 0755 {src_dir}",
+                    f"    ln -s $libs {src_dir}/. 2>/dev/null",
+                    f'  elif compgen -G "/usr/lib/lib{pat_subdir}.so*" >/dev/null; then',
+                    f"    mkdir -p {usr_lib_dir} && chmod 0755 {usr_lib_dir}",
+                    f"    ln -s $libs {usr_lib_dir}/. 2>/dev/null",
+                    "  fi"))
             setup_script.append("fi")
         ld_lib_path.append(target_lib_dir)
     # add libraries to LD_LIBRARY_PATH rather than adding to system /etc/ld.so.conf in the
@@ -325,8 +406,9 @@ def _add_nvidia_bin_links(mount_bin_dirs: list[str], script: list[str]) -> None:
     script.append("# setup binaries")
     for mount_bin_dir in mount_bin_dirs:
         for pat in _NVIDIA_BIN_PATTERNS:
-            script.append(f'bins="$(compgen -G "{mount_bin_dir}/{pat}")"')
-            script.append('if [ "$?" -eq 0 ]; then ln -sf $bins /usr/local/bin/. 2>/dev/null; fi')
+            script.extend((
+                f'bins="$(compgen -G "{mount_bin_dir}/{pat}")"',
+                'if [ "$?" -eq 0 ]; then ln -sf $bins /usr/local/bin/. 2>/dev/null; fi'))
 
 
 def _process_nvidia_data_files(docker_args: list[str], script: list[str],
@@ -343,25 +425,28 @@ def _process_nvidia_data_files(docker_args: list[str], script: list[str],
     script.append("# setup data files")
     nvidia_data_dirs = set[str]()
     idx = 0
-    for pat in _NVIDIA_DATA_PATTERNS:
-        for path in glob.glob(pat):
-            if not os.path.exists(resolved_path := realpath(path)):
-                continue
-            path_is_dir = os.path.isdir(resolved_path)
-            data_dir = resolved_path if path_is_dir else os.path.dirname(resolved_path)
-            if data_dir in nvidia_data_dirs:
-                continue
-            mount_data_dir = f"{mount_data_dir_prefix}{idx}"
-            idx += 1
-            add_mount_option(docker_args, data_dir, mount_data_dir, "ro")
-            nvidia_data_dirs.add(data_dir)
-            path_dir = os.path.dirname(path)
-            script.append(f"mkdir -p {path_dir} && chmod 0755 {path_dir} && \\")
-            if path_is_dir:
-                # links for data directories need to be in the same location as original
-                script.append(f"  rm -rf {path} && ln -s {mount_data_dir} {path}")
-            else:
-                # assume that files inside other directories have the pattern "*nvidia*",
-                # so the code avoids hard-coding fully resolved patterns to deal with
-                # a case when the data file name changes after driver upgrade
-                script.append(f"  ln -sf {mount_data_dir}/*nvidia* {path_dir}/. 2>/dev/null")
+    for path in chain.from_iterable(glob.iglob(pat) for pat in _NVIDIA_DATA_PATTERNS):
+        # a single stat to check for existence as well as directory
+        try:
+            path_is_dir = stat.S_ISDIR(os.stat(resolved_path := _realpath(path)).st_mode)
+        except OSError:
+            continue
+        # the paths are absolute, so the directory is the part before the last '/'
+        data_dir = resolved_path if path_is_dir else (
+            resolved_path[:resolved_path.rfind("/")] or "/")
+        if data_dir in nvidia_data_dirs:
+            continue
+        mount_data_dir = f"{mount_data_dir_prefix}{idx}"
+        idx += 1
+        add_mount_option(docker_args, data_dir, mount_data_dir, "ro")
+        nvidia_data_dirs.add(data_dir)
+        path_dir = path[:path.rfind("/")] or "/"
+        script.append(f"mkdir -p {path_dir} && chmod 0755 {path_dir} && \\")
+        if path_is_dir:
+            # links for data directories need to be in the same location as original
+            script.append(f"  rm -rf {path} && ln -s {mount_data_dir} {path}")
+        else:
+            # assume that files inside other directories have the pattern "*nvidia*",
+            # so the code avoids hard-coding fully resolved patterns to deal with
+            # a case when the data file name changes after driver upgrade
+            script.append(f"  ln -sf {mount_data_dir}/*nvidia* {path_dir}/. 2>/dev/null")
@@ -11,8 +11,10 @@ from configparser import ConfigParser
 from contextlib import closing
 from dataclasses import dataclass
 from enum import Enum, IntFlag, auto
+from functools import lru_cache
 from importlib.resources import files
 from io import StringIO
+from types import CodeType
 from typing import Iterable, Iterator, Optional, Union
 from uuid import uuid4
 
@@ -349,11 +351,23 @@ class YboxStateManagement:
         for script in scripts:
             print_color(f"Running migration script '{script}' for container version upgrade from "
                         f"{old_version} to {self._version}")
-            with script.open("r", encoding="utf-8") as py_fd:
-                exec(py_fd.read(), {}, {"conf": conf, "distro_config": distro_config})
+            exec(self._compile_migration_script(script), {},
+                 {"conf": conf, "distro_config": distro_config})
         # finally write the current version to "version" file in scripts directory of the container
         write_ybox_version(conf)
 
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def _compile_migration_script(script: PathName) -> CodeType:
+        """
+        Compile a python migration script, caching the resulting code object so that migrating
+        multiple containers in the same process reads and parses each script only once.
+
+        :param script: path of the migration script
+        :return: compiled code object of the script that can be passed to `exec`
+        """
+        return compile(script.read_bytes(), str(script), "exec")
+
     def register_container(self, container_name: str, distribution: str, shared_root: str,
                            parser: ConfigParser, force_own_orphans: bool = True) -> \
             dict[str, tuple[CopyType, dict[str, str]]]:
@@ -138,7 +138,8 @@ def ini_file_reader(fd: Iterable[str], interpolation: Optional[Interpolation],
     return config
 
 
-def copy_file(src: PathName, dest: str, permissions: Optional[int] = None) -> None:
+def copy_file(src: PathName, dest: str, permissions: Optional[int] = None,
+              skip_unchanged: bool = False) -> None:
     """
     Copy a given source file (can be on filesystem or package resource) to destination path
     overwriting if it exists, and with given optional permissions. If `permissions` is not provided
@@ -150,9 +151,13 @@ def copy_file(src: PathName, dest: str, permissions: Optional[int] = None) -> No
     :param dest: destination file path
     :param permissions: optional file permissions as an integer as accepted by :func:`os.chmod`,
                         defaults to None
+    :param skip_unchanged: if True then skip writing to `dest` if it already has the same contents
+                           as `src` (the permissions are still updated), defaults to False
     """
-    with open(dest, "wb") as dest_fd:
-        dest_fd.write(src.read_bytes())
+    data = src.read_bytes()
+    if not skip_unchanged or not _has_same_contents(dest, data):
+        with open(dest, "wb") as dest_fd:
+            dest_fd.write(data)
     if permissions is not None:
         os.chmod(dest, permissions)
     elif hasattr(src, "stat"):  # copy the permissions
@@ -163,6 +168,18 @@ def copy_file(src: PathName, dest: str, permissions: Optional[int] = None) -> No
         os.chmod(dest, perms)
 
 
+def _has_same_contents(path: str, data: bytes) -> bool:
+    """check if the file at given path exists and has exactly the given contents"""
+    try:
+        # compare the sizes first to avoid reading the file if they differ
+        if os.stat(path).st_size != len(data):
+            return False
+        with open(path, "rb") as path_fd:
+            return path_fd.read() == data
+    except OSError:
+        return False
+
+
 def copy_ybox_scripts_to_container(conf: StaticConfiguration, distro_config: ConfigParser) -> None:
     """
     Copy ybox setup scripts to local directory mounted on container.
@@ -175,7 +192,7 @@ def copy_ybox_scripts_to_container(conf: StaticConfiguration, distro_config: Con
     # copy the common scripts
     for script in Consts.resource_scripts():
         path = env.search_config_path(f"resources/{script}", only_sys_conf=True)
-        copy_file(path, f"{conf.scripts_dir}/{script}", permissions=0o755)
+        copy_file(path, f"{conf.scripts_dir}/{script}", permissions=0o755, skip_unchanged=True)
     # also copy distribution specific scripts
     base_section = distro_config["base"]
     if scripts := base_section.get("scripts"):
@@ -183,7 +200,8 @@ def copy_ybox_scripts_to_container(conf: StaticConfiguration, distro_config: Con
             script = script.strip()
             path = env.search_config_path(conf.distribution_config(conf.distribution, script),
                                           only_sys_conf=True)
-            copy_file(path, f"{conf.scripts_dir}/{os.path.basename(script)}", permissions=0o644)
+            copy_file(path, f"{conf.scripts_dir}/{os.path.basename(script)}", permissions=0o644,
+                      skip_unchanged=True)
         # finally copy the ybox python module which may be used by distribution scripts
         src_dir = files("ybox")
         dest_dir = f"{conf.scripts_dir}/ybox"
@@ -192,7 +210,8 @@ def copy_ybox_scripts_to_container(conf: StaticConfiguration, distro_config: Con
         os.chmod(dest_dir, mode=0o755)
         for resource in src_dir.iterdir():
             if resource.is_file():
-                copy_file(resource, f"{dest_dir}/{resource.name}", permissions=0o644)
+                copy_file(resource, f"{dest_dir}/{resource.name}", permissions=0o644,
+                          skip_unchanged=True)
 
 
 def write_ybox_version(conf: StaticConfiguration) -> None:
@@ -298,6 +317,41 @@ def check_package(docker_cmd: str, check_cmd: str, package: str,
     return (check_result.returncode, output) if output else (1, output)
 
 
+def check_packages(docker_cmd: str, check_cmd: str, packages: list[str],
+                   container_name: str) -> dict[str, list[str]]:
+    """
+    Like :func:`check_package` but check multiple packages using a single podman/docker exec.
+
+    :param docker_cmd: the podman/docker executable to use
+    :param check_cmd: the command used to check the existence of a package
+    :param packages: names of the packages to check
+    :param container_name: name of the container
+    :return: dictionary of each of the given packages to the list of matching package names
+             which is empty if the check for the package failed
+    """
+    # run each check in a sub-shell followed by a marker line having the index of the package
+    # and the exit code of the check; the marker is preceded by a newline in case the output
+    # of the check does not end with one
+    marker = Consts.default_field_separator()
+    shell_cmd = "; ".join(
+        f"({check_cmd.format(package=package)}); printf '\\n{marker}{idx}:%s\\n' $?"
+        for idx, package in enumerate(packages))
+    check_result = subprocess.run(build_shell_command(
+        docker_cmd, container_name, shell_cmd, enable_pty=False),
+        check=False, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    result = {package: list[str]() for package in packages}
+    output: list[str] = []
+    for line in check_result.stdout.decode("utf-8").splitlines():
+        if line.startswith(marker):
+            idx, _, code = line[len(marker):].partition(":")
+            if code == "0" and output:
+                result[packages[int(idx)]] = output
+            output = []
+        elif line:
+            output.append(line)
+    return result
+
+
 def select_item_from_menu(items: list[str]) -> Optional[str]:
     """
     Display a list of items on terminal and allow user to select an item from it interactively
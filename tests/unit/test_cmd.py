@@ -12,8 +12,9 @@ from uuid import uuid4
 import pytest
 
 from ybox.cmd import (YboxLabel, build_shell_command, check_active_ybox,
-                      check_ybox_exists, get_ybox_state, page_command,
-                      page_output, parse_opt_deps_args, run_command)
+                      check_ybox_exists, get_active_yboxes, get_ybox_state,
+                      page_command, page_output, parse_opt_deps_args,
+                      run_command)
 from ybox.env import get_docker_command
 from ybox.print import fgcolor
 
@@ -60,6 +61,7 @@ def test_check_ybox_state(capsys: pytest.CaptureFixture[str]):
                                   exit_on_error=False)
         assert not check_active_ybox(docker_cmd, cnt_name)
         assert not check_active_ybox(docker_cmd, cnt_name, exit_on_error=False)
+        assert cnt_name not in get_active_yboxes(docker_cmd)
         assert not get_ybox_state(docker_cmd, cnt_name, expected_states=())
         assert not check_ybox_exists(docker_cmd, cnt_name)
         assert not check_ybox_exists(docker_cmd, cnt_name, exit_on_error=False)
@@ -105,6 +107,7 @@ def test_check_ybox_state(capsys: pytest.CaptureFixture[str]):
         assert get_ybox_state(docker_cmd, cnt_name, expected_states=("running",),
                               exit_on_error=False) == ("running", _TEST_DISTRO)
         assert check_active_ybox(docker_cmd, cnt_name)
+        assert cnt_name in get_active_yboxes(docker_cmd)
         assert check_ybox_exists(docker_cmd, cnt_name)
         _stop_container(docker_cmd, cnt_name, check_removed=True)
 
@@ -116,6 +119,7 @@ def test_check_ybox_state(capsys: pytest.CaptureFixture[str]):
         _stop_container(docker_cmd, cnt_name)
         assert not get_ybox_state(docker_cmd, cnt_name, expected_states=["running"])
         assert not check_active_ybox(docker_cmd, cnt_name)
+        assert cnt_name not in get_active_yboxes(docker_cmd)
         pytest.raises(SystemExit, check_active_ybox, docker_cmd, cnt_name, exit_on_error=True)
         assert get_ybox_state(docker_cmd, cnt_name, expected_states=["stopped", "exited"],
                               exit_on_error=False) == ("exited", _TEST_DISTRO)
@@ -1,18 +1,22 @@
 """Unit tests for `ybox/env.py`"""
 
 import getpass
+import json
 import os
 import pwd
 import re
 from datetime import datetime, timedelta
 from importlib.resources import files
 from pathlib import Path
+from typing import Optional
 from unittest.mock import patch
 from uuid import uuid4
 
 import pytest
 
-from ybox.env import Environ, NotSupportedError, get_docker_command
+from ybox.env import _docker_context  # type: ignore
+from ybox.env import (Environ, NotSupportedError, clear_environ,
+                      get_docker_command, get_environ)
 
 
 @pytest.fixture(name="g_env", scope="module")
@@ -75,18 +79,21 @@ def test_get_docker_command(g_env: Environ):
     """check `Environ.get_docker_command` function"""
     docker_cmd = get_docker_command()
     assert docker_cmd is not None
-    assert re.match(r"/usr/bin/(podman|docker)", docker_cmd)
+    assert re.match(r"/usr(/local)?/bin/(podman|docker)", docker_cmd)
     assert os.access(docker_cmd, os.X_OK)
     assert docker_cmd == g_env.docker_cmd
     assert g_env.uses_podman == ("podman" in docker_cmd)
     # try with explicit environment variable
     current_ybox_manager = os.environ.get("YBOX_CONTAINER_MANAGER")
     os.environ["YBOX_CONTAINER_MANAGER"] = "/bin/true"
+    # force docker context to be determined using "docker context show" which is mocked below
+    docker_vars = {"DOCKER_HOST": "", "DOCKER_CONTEXT": "", "DOCKER_CONFIG": f"/tmp/{uuid4()}"}
     try:
         docker_cmd = get_docker_command()
         assert docker_cmd == "/bin/true"
         # creating Environ should fail when checking for rootless docker
-        pytest.raises(NotSupportedError, Environ)
+        with patch.dict(os.environ, docker_vars):
+            pytest.raises(NotSupportedError, Environ)
         # try with explicit environment variable for a non-existent program or a non-executable
         os.environ["YBOX_CONTAINER_MANAGER"] = "/non-existent"
         pytest.raises(PermissionError, get_docker_command)
@@ -96,8 +103,10 @@ def test_get_docker_command(g_env: Environ):
         del os.environ["YBOX_CONTAINER_MANAGER"]
 
         # mock for different podman/docker executables including none available
-        def os_access(prog: str, mode: int) -> bool:
-            return prog == check_prog and mode == os.X_OK
+        def which(name: str, path: str) -> Optional[str]:
+            dirs = path.split(os.pathsep)
+            return check_prog if os.path.basename(check_prog) == name and os.path.dirname(
+                check_prog) in dirs else None
 
         def subproc_out(cmd: list[str]) -> bytes:
             if "podman" in cmd[0]:
@@ -105,8 +114,9 @@ def test_get_docker_command(g_env: Environ):
             if len(cmd) == 3 and cmd[1] == "context" and cmd[2] == "show":
                 return b"rootless"
             return b"docker x.x"
-        with patch("ybox.env.os.access", side_effect=os_access), \
-                patch("ybox.env.subprocess.check_output", side_effect=subproc_out):
+        with patch("ybox.env.shutil.which", side_effect=which), \
+                patch("ybox.env.subprocess.check_output", side_effect=subproc_out), \
+                patch.dict(os.environ, docker_vars):
             check_prog = "/usr/bin/podman"
             assert get_docker_command() == check_prog
             env = Environ()
@@ -129,6 +139,79 @@ def test_get_docker_command(g_env: Environ):
             os.environ.pop("YBOX_CONTAINER_MANAGER", None)
 
 
+def test_docker_context(tmp_path: Path):
+    """check determination of the current docker context in `_docker_context`"""
+    rootless_host = f"unix:///run/user/{os.getuid()}/docker.sock"
+    config_file = tmp_path / "config.json"
+    docker_vars = {"DOCKER_HOST": "", "DOCKER_CONTEXT": "", "DOCKER_CONFIG": str(tmp_path)}
+    with patch("ybox.env.subprocess.check_output", return_value=b"default\n") as check_output, \
+            patch.dict(os.environ, docker_vars):
+        # no variables and no config.json should fall back to "docker context show"
+        assert _docker_context("docker") == "default"
+        check_output.assert_called_once_with(["docker", "context", "show"])
+        check_output.reset_mock()
+
+        # currentContext in config.json
+        config_file.write_text(json.dumps({"currentContext": "rootless"}), encoding="utf-8")
+        assert _docker_context("docker") == "rootless"
+        # config.json without currentContext, or an invalid one, should fall back
+        config_file.write_text(json.dumps({"auths": {}}), encoding="utf-8")
+        assert _docker_context("docker") == "default"
+        config_file.write_text("[1, 2", encoding="utf-8")
+        assert _docker_context("docker") == "default"
+        assert check_output.call_count == 2
+        check_output.reset_mock()
+
+        # $DOCKER_CONTEXT takes precedence over config.json
+        config_file.write_text(json.dumps({"currentContext": "rootless"}), encoding="utf-8")
+        os.environ["DOCKER_CONTEXT"] = "remote"
+        assert _docker_context("docker") == "remote"
+
+        # $DOCKER_HOST takes precedence over both: the user's socket is a rootless daemon
+        # while any other endpoint is determined using "docker context show"
+        os.environ["DOCKER_HOST"] = rootless_host
+        assert _docker_context("docker") == "rootless"
+        check_output.assert_not_called()
+        os.environ["DOCKER_HOST"] = "unix:///var/run/docker.sock"
+        assert _docker_context("docker") == "default"
+        check_output.assert_called_once_with(["docker", "context", "show"])
+
+
+def test_get_environ(g_env: Environ):
+    """check `get_environ` function"""
+    clear_environ()
+    env = get_environ()
+    assert env is get_environ()
+    # explicit default podman/docker command should share the same object
+    assert env is get_environ(get_docker_command())
+    assert env is get_environ()
+    assert env.docker_cmd == g_env.docker_cmd
+    assert env.home == g_env.home
+    clear_environ()
+    assert get_environ() is not env
+
+
+def test_get_environ_shared():
+    """check that `get_environ` shares the object for default and explicit podman/docker"""
+    def new_environ(_docker_cmd: str) -> object:
+        return object()
+
+    clear_environ()
+    try:
+        with patch("ybox.env.get_docker_command", return_value="/usr/bin/podman"), \
+                patch("ybox.env.Environ", side_effect=new_environ) as environ:
+            env = get_environ()
+            assert get_environ("/usr/bin/podman") is env
+            assert get_environ() is env
+            environ.assert_called_once_with("/usr/bin/podman")
+            # a different command should create a new object
+            assert get_environ("/usr/bin/docker") is not env
+            clear_environ()
+            assert get_environ() is not env
+    finally:
+        clear_environ()
+
+
 def test_search_config(g_env: Environ):
     """check `Environ.search_config_path` function"""
 
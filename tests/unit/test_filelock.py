@@ -5,11 +5,15 @@ import fcntl
 import multiprocessing
 import multiprocessing.context
 import os
+import signal
+import threading
 import time
 from datetime import datetime
 from multiprocessing import Process
 from multiprocessing.synchronize import Event
 from pathlib import Path
+from types import FrameType
+from typing import Optional
 from unittest.mock import patch
 from uuid import uuid4
 
@@ -98,8 +102,8 @@ def test_timeout():
     assert proc.exitcode == 0
 
 
-def test_poll():
-    """test timeout with poll interval on a locked file"""
+def test_wait():
+    """test timeout when waiting for the lock in the main thread which ignores poll interval"""
     with FileLock(_LOCK_FILE):
         assert os.path.exists(_LOCK_FILE)
 
@@ -110,16 +114,156 @@ def test_poll():
                     pass
             start2 = datetime.now()
             with pytest.raises(TimeoutError):
-                with FileLock(_LOCK_FILE, timeout_secs=2.0, poll_interval=2.0):
+                with FileLock(_LOCK_FILE, timeout_secs=2.0, poll_interval=5.0):
                     pass
             elapsed1 = (start2 - start1).total_seconds()
             assert 2.0 <= elapsed1 < 3.0
             elapsed2 = (datetime.now() - start2).total_seconds()
-            assert 2.0 <= elapsed2 < 6.0
+            assert 2.0 <= elapsed2 < 3.0
 
         _run_in_process(do_lock)
 
 
+def test_wait_release():
+    """test that the lock is acquired as soon as it is released when waiting in main thread"""
+    def do_lock(e: Event) -> None:
+        with FileLock(_LOCK_FILE):
+            e.set()
+            time.sleep(1.0)
+
+    ev = multiprocessing.Event()
+    proc = _run_in_process(do_lock, args=(ev,), wait_for_process=False)
+    ev.wait()
+    start = datetime.now()
+    # polling would take at least the poll interval to acquire the lock
+    with FileLock(_LOCK_FILE, timeout_secs=5.0, poll_interval=10.0):
+        elapsed = (datetime.now() - start).total_seconds()
+        assert elapsed < 3.0
+    proc.join()
+    assert proc.exitcode == 0
+
+
+def test_wait_alarm_after_lock():
+    """test the case where the timeout alarm fires just after the blocking lock succeeds"""
+    real_lockf = fcntl.lockf
+
+    def lockf_with_alarm(fd: int, cmd: int) -> None:
+        real_lockf(fd, cmd)
+        if cmd == fcntl.LOCK_EX:
+            signal.raise_signal(signal.SIGALRM)
+
+    def do_lock(e: Event) -> None:
+        with FileLock(_LOCK_FILE):
+            e.set()
+            time.sleep(1.0)
+
+    ev = multiprocessing.Event()
+    proc = _run_in_process(do_lock, args=(ev,), wait_for_process=False)
+    ev.wait()
+    with patch("ybox.filelock.fcntl.lockf", side_effect=lockf_with_alarm):
+        with FileLock(_LOCK_FILE, timeout_secs=5.0):
+            pass
+    proc.join()
+    assert proc.exitcode == 0
+
+
+def test_wait_alarm_before_disarm():
+    """test the case where the timeout alarm fires after the lock but before timer is disarmed"""
+    real_setitimer = signal.setitimer
+
+    def setitimer_with_alarm(which: int, seconds: float, interval: float = 0.0):
+        if seconds == 0:
+            signal.raise_signal(signal.SIGALRM)
+        return real_setitimer(which, seconds, interval)
+
+    def do_lock(e: Event) -> None:
+        with FileLock(_LOCK_FILE):
+            e.set()
+            time.sleep(1.0)
+
+    alarms: list[int] = []
+
+    def on_alarm(signum: int, _frame: Optional[FrameType]) -> None:
+        alarms.append(signum)
+
+    old_handler = signal.signal(signal.SIGALRM, on_alarm)
+    try:
+        ev = multiprocessing.Event()
+        proc = _run_in_process(do_lock, args=(ev,), wait_for_process=False)
+        ev.wait()
+        real_setitimer(signal.ITIMER_REAL, 5.0)
+        with patch("ybox.filelock.signal.setitimer", side_effect=setitimer_with_alarm):
+            with FileLock(_LOCK_FILE, timeout_secs=5.0):
+                # lock should be held and the previous handler and timer restored
+                assert signal.getsignal(signal.SIGALRM) is on_alarm
+                assert not alarms
+                remaining, _ = signal.getitimer(signal.ITIMER_REAL)
+                assert 0.0 < remaining < 5.0
+        proc.join()
+        assert proc.exitcode == 0
+    finally:
+        real_setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, old_handler)
+
+
+def test_wait_restores_timer():
+    """test that an existing SIGALRM handler and timer are restored after waiting for lock"""
+    def do_lock(e: Event) -> None:
+        with FileLock(_LOCK_FILE):
+            e.set()
+            time.sleep(1.0)
+
+    alarms: list[int] = []
+    old_handler = signal.signal(signal.SIGALRM, lambda signum, _: alarms.append(signum))
+    try:
+        ev = multiprocessing.Event()
+        proc = _run_in_process(do_lock, args=(ev,), wait_for_process=False)
+        ev.wait()
+        signal.setitimer(signal.ITIMER_REAL, 3.0)
+        with FileLock(_LOCK_FILE, timeout_secs=5.0):
+            pass
+        proc.join()
+        assert proc.exitcode == 0
+        remaining, _ = signal.getitimer(signal.ITIMER_REAL)
+        assert 0.0 < remaining < 3.0
+        assert not alarms
+        # the timer should fire with the original handler
+        time.sleep(remaining + 0.5)
+        assert alarms == [signal.SIGALRM]
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, old_handler)
+
+
+def test_poll_in_thread():
+    """test timeout with polling which is used when waiting for lock in a non-main thread"""
+    with FileLock(_LOCK_FILE):
+
+        def do_lock() -> None:
+            start = datetime.now()
+            with pytest.raises(TimeoutError):
+                with FileLock(_LOCK_FILE, timeout_secs=2.0, poll_interval=0.5):
+                    pass
+            elapsed = (datetime.now() - start).total_seconds()
+            assert 2.0 <= elapsed < 3.0
+
+        def do_lock_in_thread() -> None:
+            errors: list[BaseException] = []
+
+            def run() -> None:
+                try:
+                    do_lock()
+                except BaseException as ex:  # pylint: disable=broad-exception-caught
+                    errors.append(ex)
+
+            thread = threading.Thread(target=run)
+            thread.start()
+            thread.join()
+            assert not errors, errors
+
+        _run_in_process(do_lock_in_thread)
+
+
 @pytest.fixture(autouse=True)
 def cleanup():
     """clean up the lock file"""
@@ -0,0 +1,39 @@
+"""Unit tests for `ybox/run/graphics.py`"""
+
+import glob
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ybox.run.graphics import _NVIDIA_BIN_NAME_PATTERNS  # type: ignore
+from ybox.run.graphics import _NVIDIA_BIN_PATTERNS  # type: ignore
+from ybox.run.graphics import _NVIDIA_LIB_NAME_PATTERNS  # type: ignore
+from ybox.run.graphics import _NVIDIA_LIB_PATTERNS  # type: ignore
+from ybox.run.graphics import _filter_nvidia_dirs  # type: ignore
+
+
+def test_filter_nvidia_dirs(tmp_path: Path):
+    """check that directories are filtered the same way as globs of NVIDIA artifacts"""
+    dir_files = {"lib1": ["libnvidia-glcore.so.550", "libc.so.6"], "lib2": ["libcuda.so"],
+                 "lib3": [".nvidia.so.bak", ".libcuda.so", "nvidia.txt"],
+                 "lib4": ["gbm/nvidia-drm_gbm.so", "gbm/.nvidia.so"], "lib5": ["gbm/.x.so"],
+                 "lib6": ["vdpau/libvdpau_nvidia.so.1"], "lib7": [],
+                 "bin1": ["nvidia-smi", "ls"], "bin2": [".nvidia-smi", "nvidia-smi.bak"],
+                 "bin3": ["nvidia-cuda-mps-server"]}
+    for dir_name, files in dir_files.items():
+        (tmp_path / dir_name).mkdir()
+        for file in files:
+            (tmp_path / dir_name / file).parent.mkdir(exist_ok=True)
+            (tmp_path / dir_name / file).write_bytes(b"")
+    dirs = [str(d) for d in sorted(tmp_path.iterdir())] + [f"{tmp_path}/missing"]
+
+    def glob_filter(patterns: list[str]) -> list[str]:
+        return [d for d in dirs if any(glob.glob(f"{d}/{pat}") for pat in patterns)]
+
+    expected_lib_dirs = [f"{tmp_path}/{d}" for d in ("lib1", "lib2", "lib4", "lib6")]
+    expected_bin_dirs = [f"{tmp_path}/{d}" for d in ("bin1", "bin3")]
+    assert glob_filter(_NVIDIA_LIB_PATTERNS) == expected_lib_dirs
+    assert glob_filter(_NVIDIA_BIN_PATTERNS) == expected_bin_dirs
+    assert _filter_nvidia_dirs(dirs, _NVIDIA_LIB_NAME_PATTERNS) == expected_lib_dirs
+    assert _filter_nvidia_dirs(dirs, _NVIDIA_BIN_NAME_PATTERNS) == expected_bin_dirs
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert _filter_nvidia_dirs(dirs, _NVIDIA_LIB_NAME_PATTERNS, executor) == expected_lib_dirs
@@ -0,0 +1,69 @@
+"""Unit tests for `ybox/pkg/info.py`"""
+
+import argparse
+import errno
+import io
+import signal
+import subprocess
+from configparser import SectionProxy
+from types import SimpleNamespace
+from typing import cast
+from unittest.mock import MagicMock, patch
+
+from ybox.cmd import PkgMgr
+from ybox.config import StaticConfiguration
+from ybox.pkg.info import info_packages
+
+_PKGMGR = cast(SectionProxy, {PkgMgr.INFO.value: "info {quiet} {packages}",
+                              PkgMgr.INFO_ALL.value: "info-all {quiet} {packages}",
+                              PkgMgr.QUIET_DETAILS_FLAG.value: "-q"})
+_CONF = cast(StaticConfiguration, SimpleNamespace(box_name="ybox-test", pager="less"))
+
+
+def _run_info(info_code: int, pager_code: int = 0, is_tty: bool = True) -> tuple[int, MagicMock]:
+    """run `info_packages` with mocked command and pager returning given exit codes"""
+    args = argparse.Namespace(packages=["pkg1", "pkg 2"], quiet=False, all=False, pager=None)
+    info_out = io.BytesIO(b"package info\n")
+    info_proc = MagicMock(stdout=info_out)
+    info_proc.wait.return_value = info_code
+    with patch("ybox.pkg.info.subprocess.Popen") as popen, \
+            patch("ybox.pkg.info.page_output", return_value=pager_code) as page_output, \
+            patch("ybox.pkg.info.sys.stdout.isatty", return_value=is_tty):
+        popen.return_value.__enter__.return_value = info_proc
+        code = info_packages(args, _PKGMGR, "podman", _CONF)
+        # output of the command should be streamed to the pager
+        page_output.assert_called_once_with(info_out, "less")
+        assert info_out.closed
+    return code, popen
+
+
+def test_info_packages():
+    """check the exit codes and podman/docker command of `info_packages`"""
+    code, popen = _run_info(0)
+    assert code == 0
+    # the command should not read from the terminal that is shared with the pager
+    popen.assert_called_once_with(
+        ["podman", "exec", "-t", "ybox-test", "/bin/bash", "-c", "info  pkg1 'pkg 2'"],
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE)
+    # no pseudo-terminal when output is redirected
+    code, popen = _run_info(0, is_tty=False)
+    assert code == 0
+    assert popen.call_args.args[0] == ["podman", "exec", "ybox-test", "/bin/bash", "-c",
+                                       "info  pkg1 'pkg 2'"]
+    # SIGPIPE due to an early exit from the pager is a normal exit
+    assert _run_info(-signal.SIGPIPE)[0] == 0
+    assert _run_info(128 + signal.SIGPIPE)[0] == 0
+    assert _run_info(128 + signal.SIGPIPE, 3)[0] == 3
+    # other failures of the command or pager should be reported
+    assert _run_info(1)[0] == 1
+    assert _run_info(-signal.SIGTERM)[0] == -signal.SIGTERM
+    assert _run_info(2, 3)[0] == 2
+    assert _run_info(0, 3)[0] == 3
+
+
+def test_info_no_command():
+    """check failure in invoking podman/docker"""
+    args = argparse.Namespace(packages=["pkg1"], quiet=True, all=True, pager="")
+    with patch("ybox.pkg.info.subprocess.Popen",
+               side_effect=FileNotFoundError(errno.ENOENT, "not found")):
+        assert info_packages(args, _PKGMGR, "podman", _CONF) == errno.ENOENT
@@ -0,0 +1,316 @@
+"""Unit tests for `ybox/pkg/inst.py`"""
+
+import argparse
+import glob
+import io
+import os
+import shutil
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Optional, cast
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
+import pytest
+
+from ybox.config import StaticConfiguration
+from ybox.pkg.inst import _ICON_DIR_RE  # type: ignore
+from ybox.pkg.inst import _confirm_app_icons  # type: ignore
+from ybox.pkg.inst import _display_till_header  # type: ignore
+from ybox.pkg.inst import _fetch_container_files  # type: ignore
+from ybox.pkg.inst import _install_optional_deps  # type: ignore
+from ybox.pkg.inst import _select_app_icon  # type: ignore
+from ybox.pkg.inst import (docker_cp_files, get_optional_deps,
+                           wrap_container_files)
+from ybox.state import CopyType, RuntimeConfiguration, YboxStateManagement
+
+
+def test_wrap_app_flags(tmp_path: Path):
+    """test [app_flags] of container configuration are applied to mixed-case executables"""
+    env = SimpleNamespace(user_executables_dir=str(tmp_path),
+                          user_applications_dir=f"{tmp_path}/applications",
+                          user_base=str(tmp_path))
+    conf = cast(StaticConfiguration, SimpleNamespace(box_name="ybox-test", env=env))
+    box_conf = "[app_flags]\nGIMP = !p --foo !a\nnot-in-package = --bar !a\n"
+    # executable names are unlikely to exist in system directories to avoid any prompts
+    package_files = "/usr/bin/GIMP-ybox-test\n/usr/bin/GIMP\n/usr/bin/other-ybox-test\n"
+    with patch("ybox.pkg.inst.run_command", return_value=package_files), \
+            patch("ybox.pkg.inst._can_wrap_executable", return_value=True):
+        app_flags: dict[str, str] = {}
+        wrappers = wrap_container_files("gimp", CopyType.EXECUTABLE, app_flags, "ls {package}",
+                                        "podman", conf, box_conf, "", 1)
+        assert wrappers == [f"{tmp_path}/GIMP-ybox-test", f"{tmp_path}/GIMP",
+                            f"{tmp_path}/other-ybox-test"]
+        # only the flags for the executables of the package should be picked
+        assert app_flags == {"GIMP": "!p --foo !a"}
+        assert Path(f"{tmp_path}/GIMP").read_text(encoding="utf-8").endswith(
+            '"`pwd`" "/usr/bin/GIMP" --foo "$@"')
+        assert Path(f"{tmp_path}/other-ybox-test").read_text(encoding="utf-8").endswith(
+            '"`pwd`" "/usr/bin/other-ybox-test" "$@"')
+
+        # command-line flags should override those in the configuration
+        app_flags = {"GIMP": "!p --cmd !a"}
+        wrap_container_files("gimp", CopyType.EXECUTABLE, app_flags, "ls {package}",
+                             "podman", conf, box_conf, "", 1)
+        assert app_flags == {"GIMP": "!p --cmd !a"}
+        assert Path(f"{tmp_path}/GIMP").read_text(encoding="utf-8").endswith(
+            '"`pwd`" "/usr/bin/GIMP" --cmd "$@"')
+
+
+def test_install_optional_deps(capsys: pytest.CaptureFixture[str]):
+    """test quoting of optional dependencies and reporting of failures when installing them"""
+    conf = cast(StaticConfiguration, SimpleNamespace(box_name="ybox-test"))
+    args = argparse.Namespace()
+    deps = ["dep1", "dep;2", "dep 3"]
+    install_codes = {"install dep1 'dep;2' 'dep 3'": 1, "install dep1": 0, "install 'dep;2'": 2,
+                     "install 'dep 3'": 0}
+    commands: list[str] = []
+
+    def run_cmd(cmd: list[str], **_kwargs: Any) -> int:
+        commands.append(cmd[-1])
+        return install_codes[cmd[-1]]
+
+    def resolve_pkg(dep: str, *_args: Any) -> tuple[int, str]:
+        return -1, dep
+
+    def build_cmd(_docker_cmd: str, _box_name: str, shell_cmd: str) -> list[str]:
+        return ["docker", "exec", shell_cmd]
+
+    with patch("ybox.pkg.inst._resolve_package", side_effect=resolve_pkg), \
+            patch("ybox.pkg.inst.build_shell_command", side_effect=build_cmd), \
+            patch("ybox.pkg.inst.run_command", side_effect=run_cmd), \
+            patch("ybox.pkg.inst.check_packages",
+                  return_value={"dep1": ["dep1"], "dep;2": [], "dep 3": []}) as check_pkgs, \
+            patch("ybox.pkg.inst._wrap_and_register_package") as wrap_pkg:
+        _install_optional_deps(deps, args, "install", "ls", "podman", conf,
+                               cast(RuntimeConfiguration, None),
+                               cast(YboxStateManagement, None), True, "", "", 1)
+        # the combined installation should be retried one at a time with each dependency quoted
+        assert commands == ["install dep1 'dep;2' 'dep 3'", "install dep1", "install 'dep;2'",
+                            "install 'dep 3'"]
+        check_pkgs.assert_called_once_with("podman", "", deps, "ybox-test")
+        wrap_pkg.assert_called_once()
+        assert wrap_pkg.call_args.args[0] == "dep1"
+    err = capsys.readouterr().err
+    assert "Package 'dep;2' was not installed successfully (exit code 2)" in err
+    assert "Package 'dep 3' was not installed successfully\x1b" in err
+
+
+def test_display_till_header(capsysbinary: pytest.CaptureFixture[bytes]):
+    """test progressive display of output till the optional dependencies header"""
+    header = b"Found optional dependencies"
+    info = b"downloading\r 10%\r 50%\r100%\r\nheader Found optional dependencies\r\n"
+    pkg_data = b"PKG:dep1::::1::::false::::desc1\r\n"
+    # check all possible chunk boundaries including those splitting the header and '\r\n'
+    for chunk_size in range(1, len(info) + len(pkg_data) + 1):
+        with patch("ybox.pkg.inst._READ_CHUNK_SIZE", chunk_size):
+            for eol in (b"\r\n", b"\n"):
+                data = info + header + eol + pkg_data
+                deps_out = io.BytesIO(data)
+                rest = _display_till_header(cast(io.BufferedReader, deps_out), header)
+                # the data after the header should be returned or left in the stream
+                assert (rest + deps_out.read()).lstrip(b"\n") == pkg_data
+                assert capsysbinary.readouterr().out == info + header + eol[:1]
+    # missing header should display everything and return nothing
+    data = info + pkg_data
+    with patch("ybox.pkg.inst._READ_CHUNK_SIZE", 8):
+        assert _display_till_header(cast(io.BufferedReader, io.BytesIO(data)), header) == b""
+    assert capsysbinary.readouterr().out == data
+
+
+def test_get_optional_deps(capsysbinary: pytest.CaptureFixture[bytes]):
+    """test parsing of optional dependencies from the output with and without a pty"""
+    info = b"checking dependencies\n"
+    header = b"Found optional dependencies\n"
+    # descriptions can have characters that are line boundaries for str.splitlines()
+    pkg_data = ("PKG:dep1::::1::::false::::first\x85dep \n"
+                "PKG:dep2::::2::::true::::second\u2028dep\n"
+                "PKG:dep3::::2::::false::::third\x0cdep\n").encode("utf-8")
+    expected_deps = [("dep1", "first\x85dep", 1), ("dep3", "third\x0cdep", 2)]
+
+    def check_deps(quiet: int, output: bytes,
+                   code: int = 0) -> tuple[list[tuple[str, str, int]], set[str]]:
+        deps_result = MagicMock(stdout=io.BytesIO(output))
+        deps_result.wait.return_value = code
+        with patch("ybox.pkg.inst.subprocess.Popen") as popen:
+            popen.return_value.__enter__.return_value = deps_result
+            return get_optional_deps("pkg", "podman", "ybox-test", "deps {header}", quiet)
+
+    for quiet in (0, 1):
+        assert check_deps(quiet, info + header + pkg_data) == (expected_deps, {"dep2"})
+        assert capsysbinary.readouterr().out == info + header
+        # header on the first line
+        assert check_deps(quiet, header + pkg_data) == (expected_deps, {"dep2"})
+        assert capsysbinary.readouterr().out == header
+        # missing header
+        assert check_deps(quiet, info) == ([], set())
+        assert capsysbinary.readouterr().out == info
+        # failure of the command should skip the optional dependencies
+        assert check_deps(quiet, info + header + pkg_data, 1) == ([], {"dep2"})
+        assert b"FAILED to determine optional dependencies" in capsysbinary.readouterr().out
+    # output from a pty has '\r\n' line endings
+    crlf_output = (info + header + pkg_data).replace(b"\n", b"\r\n")
+    assert check_deps(0, crlf_output) == (expected_deps, {"dep2"})
+    assert capsysbinary.readouterr().out == (info + header).replace(b"\n", b"\r\n")[:-1]
+
+
+def test_docker_cp_files(tmp_path: Path):
+    """test copying of multiple files from a container including symlinks and missing files"""
+    # mock podman/docker that runs the command of "exec" locally
+    docker_cmd = f"{tmp_path}/docker"
+    Path(docker_cmd).write_text('#!/bin/sh\nshift 2\nexec "$@"\n', encoding="utf-8")
+    os.chmod(docker_cmd, 0o755)
+    src_dir = tmp_path / "src"
+    (src_dir / "apps").mkdir(parents=True)
+    (src_dir / "apps" / "app.desktop").write_text("[Desktop Entry]\n", encoding="utf-8")
+    (src_dir / "app.png").write_bytes(b"PNG")
+    (src_dir / "apps" / "link.desktop").symlink_to(src_dir / "apps" / "app.desktop")
+    dest_dir = tmp_path / "dest"
+    dest_dir.mkdir()
+    srcs = [f"{src_dir}/apps/app.desktop", f"{src_dir}/apps/link.desktop", f"{src_dir}/app.png"]
+    assert docker_cp_files(docker_cmd, "ybox-test", srcs, str(dest_dir)) == 0
+    for src in srcs:
+        dest = Path(f"{dest_dir}{src}")
+        # symlinks should be copied as regular files
+        assert dest.is_file() and not dest.is_symlink()
+        assert dest.read_bytes() == Path(src).read_bytes()
+    # a missing file should be skipped while still copying the others
+    shutil.rmtree(dest_dir)
+    dest_dir.mkdir()
+    docker_cp_files(docker_cmd, "ybox-test", [f"{src_dir}/missing.desktop"] + srcs, str(dest_dir))
+    for src in srcs:
+        assert Path(f"{dest_dir}{src}").read_bytes() == Path(src).read_bytes()
+    assert not os.path.lexists(f"{dest_dir}{src_dir}/missing.desktop")
+
+
+def test_fetch_container_files(tmp_path: Path):
+    """test the files that are read from shared root and those that are copied"""
+    shared_root = tmp_path / "root"
+    apps_dir = shared_root / "usr" / "share" / "applications"
+    apps_dir.mkdir(parents=True)
+    (apps_dir / "app.desktop").write_text("[Desktop Entry]\n", encoding="utf-8")
+    # relative symlink resolves within the shared root while absolute one is valid only
+    # inside the container
+    (apps_dir / "rel.desktop").symlink_to("app.desktop")
+    (apps_dir / "abs.desktop").symlink_to(f"/{uuid4()}/app.desktop")
+    # symlink to the shared root should also be resolved for the check
+    (root_link := tmp_path / "root-link").symlink_to(shared_root)
+    files = ["/usr/share/applications/app.desktop", "/usr/share/applications/rel.desktop",
+             "/usr/share/applications/abs.desktop", "/usr/share/applications/missing.desktop"]
+    fetch_dir = str(tmp_path / "fetch")
+    for root in (str(shared_root), str(root_link)):
+        with patch("ybox.pkg.inst.docker_cp_files", return_value=0) as docker_cp:
+            local_files = _fetch_container_files(files, "podman", "ybox-test", root, fetch_dir)
+            # only the file pointing outside the shared root should be copied
+            docker_cp.assert_called_once_with("podman", "ybox-test", [files[2]], fetch_dir)
+        assert local_files == {files[0]: f"{root}{files[0]}", files[1]: f"{root}{files[1]}",
+                               files[2]: f"{fetch_dir}{files[2]}",
+                               files[3]: f"{root}{files[3]}"}
+    # without shared root all the files should be copied
+    with patch("ybox.pkg.inst.docker_cp_files", return_value=0) as docker_cp:
+        local_files = _fetch_container_files(files, "podman", "ybox-test", "", fetch_dir)
+        docker_cp.assert_called_once_with("podman", "ybox-test", files, fetch_dir)
+    assert local_files == {file: f"{fetch_dir}{file}" for file in files}
+
+
+def test_wrap_container_files(tmp_path: Path):
+    """test classification of the files of a package and creation of their wrappers"""
+    shared_root = str(tmp_path / "root")
+    env = SimpleNamespace(user_executables_dir=f"{tmp_path}/bin",
+                          user_applications_dir=f"{tmp_path}/applications",
+                          user_base=f"{tmp_path}/local")
+    conf = cast(StaticConfiguration, SimpleNamespace(box_name="ybox-test", env=env))
+    desktop_content = "[Desktop Entry]\nExec=/usr/bin/app %U\n"
+    root_files = {"/usr/bin/app": "app", "/usr/share/applications/app.desktop": desktop_content,
+                  "/usr/share/icons/hicolor/48x48/apps/app.png": "png48",
+                  "/usr/share/icons/hicolor/256x256/apps/app.png": "png256",
+                  "/usr/share/pixmaps/other.xpm": "xpm",
+                  "/usr/share/man/man1/app.1.gz": "man", "/usr/lib/app/lib.so": "lib"}
+    for file, content in root_files.items():
+        Path(f"{shared_root}{file}").parent.mkdir(parents=True, exist_ok=True)
+        Path(f"{shared_root}{file}").write_text(content, encoding="utf-8")
+    # desktop file linked to an absolute path that is valid only inside the container
+    link_desktop = "/usr/share/applications/link.desktop"
+    os.symlink(f"/{uuid4()}/app.desktop", f"{shared_root}{link_desktop}")
+    package_files = "\n".join(["/usr/bin/", "/usr/share/applications/", link_desktop,
+                               *root_files.keys()]) + "\n"
+
+    def cp_files(_docker_cmd: str, _box_name: str, srcs: list[str], dest_dir: str) -> int:
+        for src in srcs:
+            Path(f"{dest_dir}{src}").parent.mkdir(parents=True, exist_ok=True)
+            Path(f"{dest_dir}{src}").write_text(desktop_content, encoding="utf-8")
+        return 0
+
+    with patch("ybox.pkg.inst.run_command", return_value=package_files), \
+            patch("ybox.pkg.inst._can_wrap_executable", return_value=True), \
+            patch("ybox.pkg.inst.docker_cp_files", side_effect=cp_files) as docker_cp:
+        wrappers = wrap_container_files("app", CopyType.DESKTOP, {}, "ls {package}", "podman",
+                                        conf, "", shared_root, 1)
+        docker_cp.assert_called_once()
+        assert docker_cp.call_args.args[2] == [link_desktop]
+        # only the desktop files and the highest priority icons should be wrapped/copied
+        icons_dir = f"{env.user_base}/share/icons"
+        assert sorted(wrappers) == sorted([
+            f"{env.user_applications_dir}/ybox.ybox-test.link.desktop",
+            f"{env.user_applications_dir}/ybox.ybox-test.app.desktop",
+            f"{icons_dir}/app.png", f"{icons_dir}/other.xpm"])
+        assert Path(f"{icons_dir}/app.png").read_text(encoding="utf-8") == "png256"
+        for wrapper in wrappers[:2]:
+            assert "exec -e=XAUTHORITY" in Path(wrapper).read_text(encoding="utf-8")
+
+        shutil.rmtree(icons_dir)
+        wrappers = wrap_container_files("app", CopyType.EXECUTABLE, {}, "ls {package}",
+                                        "podman", conf, "", shared_root, 1)
+        # executables and man pages should be linked while desktop files and icons are skipped
+        man_page = f"{env.user_base}/share/man/man1/app.1.gz"
+        assert wrappers == [f"{env.user_executables_dir}/app", man_page]
+        assert os.readlink(man_page) == f"{shared_root}/usr/share/man/man1/app.1.gz"
+        assert not os.path.exists(icons_dir)
+
+
+def test_confirm_app_icons(tmp_path: Path):
+    """test selection of icons to be copied when icons with the same names exist"""
+    env = SimpleNamespace(user_base=str(tmp_path))
+    conf = cast(StaticConfiguration, SimpleNamespace(box_name="ybox-test", env=env))
+    icons_dir = tmp_path / "share" / "icons"
+    icons_dir.mkdir(parents=True)
+    for name in ("foo.png", "foo.bar.png", "foo..png", ".hidden.png", "foobar", "baz.svg",
+                 "qux.1.xpm"):
+        (icons_dir / name).write_bytes(b"icon")
+    # select the icons from the files of the container in the directories of different sizes
+    selected_icons: dict[str, tuple[float, str]] = {}
+    icon_dir_priorities: dict[str, Optional[float]] = {}
+    for file in ("/usr/share/icons/hicolor/48x48/apps/foo.png",
+                 "/usr/share/icons/hicolor/256x256/apps/foo.png", "/usr/share/pixmaps/foo.bar.xpm",
+                 "/usr/share/icons/hicolor/16x16/apps/foobar.png", "/usr/share/pixmaps/new.png",
+                 "/usr/share/icons/hicolor/64x64/apps/hidden.png",
+                 "/usr/share/icons/hicolor/32x32/apps/qux.png",
+                 "/usr/share/icons/hicolor/scalable/apps/qux.svg"):
+        file_dir, _, filename = file.rpartition("/")
+        assert _select_app_icon(file_dir, filename, file, _ICON_DIR_RE, icon_dir_priorities,
+                                selected_icons)
+    assert selected_icons["foo"][1] == "/usr/share/icons/hicolor/256x256/apps/foo.png"
+    assert selected_icons["qux"][1] == "/usr/share/icons/hicolor/scalable/apps/qux.svg"
+
+    # existing icons should be the same as those matched by glob("<icon_name>.*")
+    prompts: dict[str, set[str]] = {}
+
+    def answer(prompt: str) -> str:
+        existing = prompt[prompt.index("[") + 1:prompt.index("]")]
+        prompts[existing] = set(existing.split())
+        return "y"
+
+    expected = {icon_name: set(glob.glob(f"{icons_dir}/{icon_name}.*"))
+                for icon_name in selected_icons}
+    with patch("builtins.input", side_effect=answer):
+        app_icons = _confirm_app_icons(selected_icons, conf, 0)
+    assert sorted(prompts.values(), key=sorted) == sorted(
+        (icons for icons in expected.values() if icons), key=sorted)
+    assert len(app_icons) == len(selected_icons)
+    # quiet mode should skip the existing icons
+    app_icons = _confirm_app_icons(selected_icons, conf, 1)
+    assert app_icons == [(path, f"{icons_dir}/{os.path.basename(path)}")
+                         for icon_name, (_, path) in selected_icons.items()
+                         if not expected[icon_name]]
+    assert [os.path.basename(path) for path, _ in app_icons] == ["foobar.png", "new.png",
+                                                                 "hidden.png"]
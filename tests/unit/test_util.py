@@ -0,0 +1,45 @@
+"""Unit tests for `ybox/util.py`"""
+
+import subprocess
+from unittest.mock import patch
+
+from ybox.util import check_packages
+
+_real_run = subprocess.run
+
+
+def _run_locally(cmd: list[str], check: bool, stdout: int,
+                 stderr: int) -> "subprocess.CompletedProcess[bytes]":
+    """run the shell command meant for the container locally using bash"""
+    return _real_run(["/bin/bash", "-c", cmd[-1]], check=check, stdout=stdout, stderr=stderr)
+
+
+def test_check_packages():
+    """check the markers and exit codes of `check_packages` for multiple packages"""
+    # mock checks for different cases: output with and without trailing newline, empty output
+    # with success exit code, multiple lines of output and a failure with some output
+    check_cmd = ('case "{package}" in '
+                 'pkg1) echo pkg1-new;; '
+                 'pkg2) printf pkg2;; '
+                 'pkg3) true;; '
+                 'pkg4) printf "pkg4-a\\npkg4-b\\n";; '
+                 'pkg5) echo pkg5; false;; '
+                 '*) exit 1;; esac')
+    packages = ["pkg1", "pkg2", "pkg3", "pkg4", "pkg5", "pkg6"]
+    with patch("ybox.util.subprocess.run", side_effect=_run_locally) as run:
+        result = check_packages("podman", check_cmd, packages, "ybox-test")
+        # all the checks should be run using a single podman/docker exec
+        run.assert_called_once()
+    assert result == {"pkg1": ["pkg1-new"], "pkg2": ["pkg2"], "pkg3": [],
+                      "pkg4": ["pkg4-a", "pkg4-b"], "pkg5": [], "pkg6": []}
+    with patch("ybox.util.subprocess.run", side_effect=_run_locally):
+        assert check_packages("podman", check_cmd, [], "ybox-test") == {}
+
+
+def test_check_packages_output():
+    """check parsing of mocked output of `check_packages` including out of order markers"""
+    output = b"b-new\n\n::::1:0\n\n::::0:1\nc\n\n::::2:0\n"
+    with patch("ybox.util.subprocess.run",
+               return_value=subprocess.CompletedProcess([], 0, stdout=output)):
+        assert check_packages("podman", "check {package}", ["a", "b", "c"], "ybox-test") == {
+            "a": [], "b": ["b-new"], "c": ["c"]}